@@ -0,0 +1,43 @@
+"""
+Measure reminder fan-out throughput against a local fake Slack client.
+
+Usage: python bench/bench_dispatcher.py [--latency 0.005] [--workers 16] [--users 1000 10000 50000]
+"""
+import argparse
+
+from fake_slack import FakeSlackClient
+from dispatcher import MessageDispatcher
+
+
+def make_sender(dispatcher: MessageDispatcher):
+    def send_message(user_id: str, message: str) -> bool:
+        response = dispatcher.call('conversations_open', users=user_id)
+        dispatcher.call('chat_postMessage', channel=response['channel']['id'], text=message)
+        return True
+    return send_message
+
+
+def run(users: int, latency: float, workers: int) -> None:
+    client = FakeSlackClient(latency=latency)
+    dispatcher = MessageDispatcher(client, max_workers=workers, rate_limits={})
+    user_ids = [f'U{i:08d}' for i in range(users)]
+    report = dispatcher.dispatch(user_ids, 'Benchmark', make_sender(dispatcher))
+    print(f"users={users:<6} workers={workers:<3} {report}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.005, help='Fake Slack call latency, seconds')
+    parser.add_argument('--workers', type=int, default=MessageDispatcher.DEFAULT_MAX_WORKERS)
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print("Sequential baseline:")
+    run(args.users[0], args.latency, 1)
+    print("Dispatcher:")
+    for users in args.users:
+        run(users, args.latency, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import threading
+import typing as tp
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot'))
+
+
+class FakeSlackClient:
+    """
+    Local stand-in for slack_sdk.WebClient with configurable latency and rate limits.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            rate_limit: tp.Optional[int] = None,
+            retry_after: int = 1,
+            workspace_size: int = 0
+    ):
+        """
+        Initialize fake client.
+
+        :param latency: Seconds every call takes
+        :param rate_limit: Calls per second per method before 429 is returned, None for unlimited
+        :param retry_after: Retry-After value sent with 429 responses
+        :param workspace_size: Number of members returned by users.list
+        """
+        self.latency = latency
+        self.workspace_size = workspace_size
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.calls: tp.Dict[str, int] = {}
+        self.rate_limited = 0
+        self._windows: tp.Dict[str, tp.List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _response(self, method: str, data: tp.Dict, status_code: int = 200, headers=None) -> SlackResponse:
+        return SlackResponse(
+            client=self, http_verb='POST', api_url=f'https://slack.com/api/{method}',
+            req_args={}, data=data, headers=headers or {}, status_code=status_code
+        )
+
+    def _call(self, method: str, data: tp.Dict) -> SlackResponse:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if self.rate_limit is not None:
+                now = time.monotonic()
+                window = [ts for ts in self._windows.get(method, []) if now - ts < 1]
+                if len(window) >= self.rate_limit:
+                    self.rate_limited += 1
+                    self._windows[method] = window
+                    response = self._response(method, {'ok': False, 'error': 'ratelimited'}, 429,
+                                              {'Retry-After': str(self.retry_after)})
+                    raise SlackApiError('ratelimited', response)
+                window.append(now)
+                self._windows[method] = window
+        if self.latency:
+            time.sleep(self.latency)
+        return self._response(method, dict(data, ok=True))
+
+    def conversations_open(self, users: str, **kwargs) -> SlackResponse:
+        return self._call('conversations_open', {'channel': {'id': f'D{users}'}})
+
+    def chat_postMessage(self, channel: str, text: str = '', **kwargs) -> SlackResponse:
+        return self._call('chat_postMessage', {'channel': channel, 'ts': f'{time.time():.6f}'})
+
+    def chat_update(self, channel: str, ts: str, text: str = '', **kwargs) -> SlackResponse:
+        return self._call('chat_update', {'channel': channel, 'ts': ts})
+
+    def users_list(self, limit: int = 200, cursor: tp.Optional[str] = None, **kwargs) -> SlackResponse:
+        start = int(cursor or 0)
+        end = min(start + limit, self.workspace_size)
+        members = [
+            {'id': f'B{i:08d}', 'name': f'bench{i}', 'deleted': False, 'profile': {'real_name': f'Bench User {i}'}}
+            for i in range(start, end)
+        ]
+        next_cursor = str(end) if end < self.workspace_size else ''
+        return self._call('users_list', {'members': members, 'response_metadata': {'next_cursor': next_cursor}})
+
+    def files_upload_v2(self, **kwargs) -> SlackResponse:
+        return self._call('files_upload_v2', {'file': {'id': 'F0000000'}})
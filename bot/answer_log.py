@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import fcntl
+import socket
+import datetime
+import threading
+import typing as tp
+
+
+class AnswerLog:
+    """
+    Append-only log of audit answers on local disk, written before answers reach the database.
+
+    Concurrent appends are written and fsynced together: the first caller writes the lines of
+    everybody waiting, the others wait for that fsync. An entry is released once it is stored in
+    the database. The log is split into segment files, a segment is deleted when all its entries
+    are released, and entries left after a restart are rewritten as one segment and replayed.
+    """
+    # Size after which the next append starts a new segment
+    SEGMENT_BYTES = 4 * 1024 * 1024
+    SEGMENT_SUFFIX = '.log'
+
+    def __init__(self, folder: str, segment_bytes: int = SEGMENT_BYTES):
+        """
+        Open the log. Every process needs its own folder, it is locked while the log is open.
+
+        :param folder: Folder of the segment files, created if missing
+        :param segment_bytes: Segment size after which a new segment is started
+        :raises OSError: If the folder can not be created or is used by another process
+        """
+        self.folder = folder
+        self.segment_bytes = segment_bytes
+        os.makedirs(folder, exist_ok=True)
+        self._lock_file = open(os.path.join(folder, 'lock'), 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise OSError(f"Answer log {folder} is used by another process")
+
+        self._condition = threading.Condition()
+        # Segments as (first sequence number, path), the last one is written to
+        self._segments: tp.List[tp.Tuple[int, str]] = [
+            (int(name[:-len(self.SEGMENT_SUFFIX)]), os.path.join(folder, name))
+            for name in sorted(os.listdir(folder)) if name.endswith(self.SEGMENT_SUFFIX)
+        ]
+        self._file: tp.Optional[tp.BinaryIO] = None
+        # Set after a failed write, the next write starts a new segment instead of appending to a damaged one
+        self._new_segment = False
+        self._last_seq = 0
+        self._synced_seq = 0
+        self._pending: tp.List[tp.Tuple[int, bytes]] = []
+        self._syncing = False
+        self._failed: tp.Dict[int, OSError] = {}
+        self._unreleased: tp.Set[int] = set()
+
+        self.appended = 0
+        self.syncs = 0
+        self.compacted_segments = 0
+        self.last_sync_latency = 0.0
+        self.max_sync_latency = 0.0
+
+    @classmethod
+    def default_folder(cls, base_folder: str) -> str:
+        """
+        Folder of this bot replica, replicas sharing a volume get separate logs.
+
+        :param base_folder: Folder of all answer logs, e.g. from ANSWER_LOG_DIR
+        :return: Folder path
+        """
+        return os.path.join(base_folder, socket.gethostname())
+
+    def recover(self) -> tp.List[tp.Tuple[int, tp.Dict]]:
+        """
+        Read answers left by the previous run and rewrite them, without damaged lines, as one
+        new segment. Every answer is kept for the answer history. Call once before the first append.
+
+        :return: List of (sequence number, answer row) to store in the database, oldest first
+        """
+        rows: tp.List[tp.Dict] = []
+        last_seq = 0
+        for index, (_, path) in enumerate(self._segments):
+            with open(path, 'rb') as file:
+                lines = file.read().split(b'\n')
+            for number, line in enumerate(lines):
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be cut by a crash, it was never acknowledged
+                    if index != len(self._segments) - 1 or number != len(lines) - 1:
+                        print(f"Answer log {path}: line {number + 1} is damaged and skipped")
+                    continue
+                last_seq = max(last_seq, entry.pop('seq'))
+                entry['answered_at'] = datetime.datetime.fromisoformat(entry['answered_at'])
+                rows.append(entry)
+        old_segments = self._segments
+        self._segments = []
+        self._last_seq = self._synced_seq = last_seq
+        if not old_segments:
+            return []
+
+        recovered = []
+        lines = []
+        for row in rows:
+            self._last_seq += 1
+            recovered.append((self._last_seq, row))
+            lines.append((self._last_seq, self._encode(self._last_seq, row)))
+        if lines:
+            # Written aside and renamed, a crash in between leaves the old segments complete
+            path = self._segment_path(lines[0][0])
+            with open(path + '.tmp', 'wb') as file:
+                file.write(b''.join(line for _, line in lines))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(path + '.tmp', path)
+            self._segments.append((lines[0][0], path))
+            self._sync_folder()
+        # The new segment starts after the last old entry, its name is not taken
+        for _, old_path in old_segments:
+            os.remove(old_path)
+        self._sync_folder()
+        self._synced_seq = self._last_seq
+        with self._condition:
+            self._unreleased.update(seq for seq, _ in recovered)
+        self.compacted_segments += len(old_segments)
+        if recovered:
+            print(f"Answer log: {len(recovered)} answers recovered from {len(old_segments)} segments")
+        return recovered
+
+    def append(self, row: tp.Dict) -> int:
+        """
+        Write an answer and wait until it is on disk.
+
+        :param row: Dictionary with audit_id, user_id, name, answer and answered_at
+        :return: Sequence number of the entry, used to release it
+        :raises OSError: If the answer could not be written
+        """
+        with self._condition:
+            self._last_seq += 1
+            seq = self._last_seq
+            self._pending.append((seq, self._encode(seq, row)))
+            self._unreleased.add(seq)
+            while self._synced_seq < seq and seq not in self._failed:
+                if self._syncing:
+                    self._condition.wait()
+                    continue
+                # This caller writes the lines of all waiting callers
+                self._syncing = True
+                lines, self._pending = self._pending, []
+                self._condition.release()
+                try:
+                    self._write(lines)
+                except OSError as e:
+                    error = e
+                else:
+                    error = None
+                finally:
+                    self._condition.acquire()
+                self._syncing = False
+                if error is None:
+                    self._synced_seq = lines[-1][0]
+                else:
+                    for line_seq, _ in lines:
+                        self._failed[line_seq] = error
+                        self._unreleased.discard(line_seq)
+                self._condition.notify_all()
+            error = self._failed.pop(seq, None)
+            if error is None:
+                self.appended += 1
+        if error is not None:
+            raise error
+        return seq
+
+    def release(self, seqs: tp.Iterable[int]) -> None:
+        """
+        Mark entries as no longer needed, and delete segments without needed entries.
+
+        :param seqs: Sequence numbers of answers stored in the database or replaced by newer answers
+        """
+        with self._condition:
+            self._unreleased.difference_update(seqs)
+            removable = []
+            if not self._unreleased and not self._pending and not self._syncing:
+                # Nothing is needed and nothing is being written, the next append starts a new segment
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                removable = [path for _, path in self._segments]
+                self._segments = []
+            else:
+                # Entries below the oldest needed one are all released
+                oldest = min(self._unreleased) if self._unreleased else self._last_seq + 1
+                # The last segment is still written to
+                while len(self._segments) > 1 and self._segments[1][0] <= oldest:
+                    removable.append(self._segments.pop(0)[1])
+        for path in removable:
+            try:
+                os.remove(path)
+                self.compacted_segments += 1
+            except OSError as e:
+                print(f"Answer log segment {path} was not removed: {e}")
+
+    def close(self) -> None:
+        """
+        Close the segment file and unlock the folder.
+        """
+        with self._condition:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._lock_file.close()
+
+    @property
+    def unreleased(self) -> int:
+        with self._condition:
+            return len(self._unreleased)
+
+    def stats(self) -> tp.Dict[str, tp.Any]:
+        """
+        Report log size and write counters.
+
+        :return: Dictionary of log metrics
+        """
+        with self._condition:
+            segments = len(self._segments)
+        return {
+            'unreleased': self.unreleased,
+            'segments': segments,
+            'appended': self.appended,
+            'syncs': self.syncs,
+            'compacted_segments': self.compacted_segments,
+            'last_sync_latency': self.last_sync_latency,
+            'max_sync_latency': self.max_sync_latency,
+        }
+
+    def _write(self, lines: tp.List[tp.Tuple[int, bytes]]) -> None:
+        """Append lines to the last segment and fsync it, called by one thread at a time."""
+        started = time.perf_counter()
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._rotate(lines[0][0])
+        offset = self._file.tell()
+        try:
+            self._file.write(b''.join(line for _, line in lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            self._discard_partial_write(offset)
+            raise
+        self.syncs += 1
+        self.last_sync_latency = time.perf_counter() - started
+        self.max_sync_latency = max(self.max_sync_latency, self.last_sync_latency)
+
+    def _discard_partial_write(self, offset: int) -> None:
+        """
+        Cut lines of a failed write from the segment, so later lines do not follow a partial one.
+        The segment is not written to again, later lines go to a new segment even if the cut fails.
+        """
+        path = self._file.name
+        try:
+            self._file.close()
+        except OSError:
+            # Closing flushes bytes left in the buffer, they are cut below as well
+            pass
+        self._file = None
+        self._new_segment = True
+        try:
+            os.truncate(path, offset)
+        except OSError as e:
+            print(f"Answer log {path}: failed write was not cut off, its lines are skipped on recovery: {e}")
+
+    def _rotate(self, first_seq: int) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with self._condition:
+            if (self._segments and not self._new_segment
+                    and os.path.getsize(self._segments[-1][1]) < self.segment_bytes):
+                # Recovered segment has room left
+                path = self._segments[-1][1]
+            else:
+                path = self._segment_path(first_seq)
+                self._segments.append((first_seq, path))
+            self._new_segment = False
+        self._file = open(path, 'ab')
+        self._sync_folder()
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.folder, f'{first_seq:012d}{self.SEGMENT_SUFFIX}')
+
+    def _sync_folder(self) -> None:
+        """Make created, renamed and removed files durable."""
+        descriptor = os.open(self.folder, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    @staticmethod
+    def _encode(seq: int, row: tp.Dict) -> bytes:
+        entry = dict(row, seq=seq, answered_at=row['answered_at'].isoformat())
+        return json.dumps(entry, ensure_ascii=False).encode() + b'\n'
@@ -0,0 +1,97 @@
+import typing as tp
+
+from sqlalchemy import select, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from db import DatabaseConfig, DataBaseManager
+from metrics import instrument_methods, DB_SECONDS, DB_ERRORS
+
+
+@instrument_methods(DB_SECONDS, DB_ERRORS)
+class AsyncDataBaseManager:
+    """
+    Database queries used by command handlers of the asyncio runtime.
+    Tables are shared with DataBaseManager.
+    """
+    DmChannel = DataBaseManager.DmChannel
+    Audit = DataBaseManager.Audit
+    AuditSchedule = DataBaseManager.AuditSchedule
+
+    def __init__(self, database_url: str, pool_options: tp.Optional[tp.Dict[str, tp.Any]] = None):
+        """
+        Initialize async database engine.
+
+        :param database_url: SQLAlchemy database URL with an async driver
+        :param pool_options: Connection pool arguments for create_async_engine
+        """
+        self.engine = create_async_engine(database_url, echo=False, **(pool_options or {}))
+
+    async def save_dm_channel(self, user_id: str, channel_id: str) -> None:
+        """
+        Store or replace direct message channel of a user.
+
+        :param user_id: Slack user ID
+        :param channel_id: Slack DM channel ID
+        """
+        statement = pg_insert(self.DmChannel.__table__).values(user_id=user_id, channel_id=channel_id)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'channel_id': statement.excluded.channel_id}
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(statement)
+
+    async def delete_dm_channel(self, user_id: str) -> None:
+        """
+        Forget direct message channel of a user.
+
+        :param user_id: Slack user ID
+        """
+        table = self.DmChannel.__table__
+        async with self.engine.begin() as conn:
+            await conn.execute(table.delete().where(table.c.user_id == user_id))
+
+    async def has_active_audit(self, audit_name: str) -> bool:
+        """
+        Check if an audit of this name is running, e.g. opened by another replica.
+
+        :param audit_name: Audit name
+        :return: True if the audit has an active reminder schedule
+        """
+        schedule = self.AuditSchedule.__table__
+        audits = self.Audit.__table__
+        statement = select(exists().where(
+            schedule.c.audit_id == audits.c.id, schedule.c.is_active.is_(True), audits.c.name == audit_name
+        ))
+        async with self.engine.connect() as conn:
+            return (await conn.execute(statement)).scalar_one()
+
+    async def get_unanswered_page(
+            self,
+            audit_id: int,
+            limit: int,
+            after_id: tp.Optional[str] = None
+    ) -> tp.List[str]:
+        """
+        Read a page of users who have not answered an audit, see DataBaseManager.get_unanswered_page.
+
+        :param audit_id: Audit ID
+        :param limit: Number of users
+        :param after_id: Return users with a greater ID
+        :return: User IDs
+        """
+        async with self.engine.connect() as conn:
+            result = await conn.execute(DataBaseManager.unanswered_page_query(audit_id, limit, after_id))
+            return list(result.scalars())
+
+
+def async_database_init() -> AsyncDataBaseManager:
+    """
+    Initialize async database manager from environment variables.
+
+    :return: Configured AsyncDataBaseManager instance
+    """
+    config = DatabaseConfig.validate_environment()
+    database_url = DatabaseConfig.get_database_url(config, driver='asyncpg')
+    return AsyncDataBaseManager(database_url, DatabaseConfig.get_pool_options())
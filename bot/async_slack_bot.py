@@ -0,0 +1,212 @@
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from sqlalchemy.exc import SQLAlchemyError
+from async_db import async_database_init
+from dispatcher import AsyncMessageDispatcher, EventLoopDispatcher
+from slack_bot import AuditBot
+from reminders import ReminderPolicy
+from metrics import timed_handler
+from user_list import UserListPage
+import time
+import json
+import asyncio
+
+
+class AsyncAuditBot(AuditBot):
+    """
+    Audit bot running on one asyncio event loop.
+
+    Hot commands (/answer and user lists) and reminder sends are coroutines using
+    the async Web API client and the async database engine, admin and ignored user
+    lists are served from the role cache. Other commands keep the
+    blocking implementation of AuditBot and run in worker threads.
+    """
+
+    def __init__(self, debug=False, started_at=None):
+        self.async_database_manager = async_database_init()
+        super().__init__(debug=debug, started_at=started_at)
+
+    def _create_app(self):
+        """ Bolt asyncio application receiving commands """
+        return AsyncApp(token=self.SLACK_BOT_TOKEN, name=self.APP_NAME)
+
+    def _create_client(self):
+        """ Blocking Slack Web API client for commands running in worker threads """
+        return WebClient(token=self.SLACK_BOT_TOKEN)
+
+    def _create_dispatcher(self):
+        """ Dispatcher running Slack calls and reminder rounds on the event loop """
+        return EventLoopDispatcher(AsyncMessageDispatcher(self.app.client))
+
+    def _create_handler(self):
+        """ Async socket mode handler needs a running event loop, it is created in _run """
+        return None
+
+    def _command(self, name, handler):
+        """ Register slash command handler, blocking handlers are run in worker threads """
+        if not asyncio.iscoroutinefunction(handler):
+            handler = self._in_thread(handler)
+        self.app.command(name)(timed_handler(name, handler))
+
+    def _action(self, action_id, handler):
+        """ Register handler of interactive components, blocking handlers are run in worker threads """
+        if not asyncio.iscoroutinefunction(handler):
+            handler = self._in_thread(handler)
+        self.app.action(action_id)(timed_handler(action_id, handler))
+
+    def _message(self, handler):
+        """ Register handler of plain messages """
+        if not asyncio.iscoroutinefunction(handler):
+            handler = self._in_thread(handler)
+        self.app.message()(timed_handler('message', handler))
+
+    @staticmethod
+    def _in_thread(func):
+        """ Wrap blocking handler: acknowledge on the loop, run the handler in a worker thread """
+        async def wrapper(ack, body, say):
+            await ack()
+            loop = asyncio.get_running_loop()
+
+            def say_from_thread(*args, **kwargs):
+                return asyncio.run_coroutine_threadsafe(say(*args, **kwargs), loop).result()
+
+            await asyncio.to_thread(func, lambda *args, **kwargs: None, body, say_from_thread)
+        return wrapper
+
+    def admin_check(self, func):
+        """ Decorator to check if the command is issued by an admin."""
+        if not asyncio.iscoroutinefunction(func):
+            return super().admin_check(func)
+
+        async def wrapper(ack, body, say, *args, **kwargs):
+            await ack()
+            if not await asyncio.to_thread(self.roles.is_admin, self._user_id(body)):
+                await say("You are not authorized to perform this action.")
+                return
+            return await func(ack, body, say, *args, **kwargs)
+        return wrapper
+
+    async def send_message(self, user_id, message) -> bool:
+        """ Alarm. Danger. This func can send messages to real people in your workspace. """
+        if not self.debug:
+            try:
+                try:
+                    await self._post_direct_message_async(user_id, message)
+                except SlackApiError as e:
+                    if e.response['error'] != 'channel_not_found' or user_id not in self.dm_channels:
+                        raise
+                    # Cached channel is gone, open a new one
+                    self.dm_channels.pop(user_id, None)
+                    try:
+                        await self.async_database_manager.delete_dm_channel(user_id)
+                    except SQLAlchemyError as e:
+                        # The stored channel fails once after restart and is replaced then
+                        print(f"DM channel of {user_id} was not deleted from the database: {e}")
+                    await self._post_direct_message_async(user_id, message)
+            except SlackApiError as e:
+                if e.response['error'] in ReminderPolicy.DEACTIVATED_ERRORS:
+                    # The audit session stops messaging the user
+                    raise
+                print(f"Error sending message: {e.response['error']}")
+                return False
+        else:
+            print(f'Message sending initialized. Message not sent - Debug "{self.debug}"')
+        return True
+
+    async def _post_direct_message_async(self, user_id, message):
+        """ Post message to the user's DM channel, opening it only if not cached """
+        dispatcher = self.dispatcher.dispatcher
+        dm_channel_id = self.dm_channels.get(user_id)
+        opened = dm_channel_id is None
+        if opened:
+            response = await dispatcher.call('conversations_open', users=user_id)
+            dm_channel_id = response["channel"]["id"]
+            self.dm_channels[user_id] = dm_channel_id
+
+        await dispatcher.call('chat_postMessage', channel=dm_channel_id, text=message)
+        if opened:
+            # Stored after the message is sent, the database only saves a conversations.open call after restart
+            try:
+                await self.async_database_manager.save_dm_channel(user_id, dm_channel_id)
+            except SQLAlchemyError as e:
+                print(f"DM channel of {user_id} is cached in memory only: {e}")
+
+    async def collect_answer(self, ack, body, say):
+        """Takes the user's answer and puts it into the answer queue"""
+        await ack()
+        data = {
+            'id': body['user_id'],
+            'name': body.get('user_name'),
+            'answer': body['text']
+        }
+        try:
+            session = await self._active_session_async()
+        except SQLAlchemyError as e:
+            print(f"Audit session lookup failed: {e}")
+            await say("The audit database is not available right now, "
+                      "please send your answer again in a few minutes.")
+            return
+        if not session:
+            await say("There is no active audit session. Please wait until an audit is started.")
+        else:
+            # The answer queue does not query the database, the thread waits for the answer log fsync
+            if await asyncio.to_thread(session.add_response, data):
+                await say(f"Thank you <@{body['user_id']}>! Your response was updated to '{body['text']}'.")
+            else:
+                await say(f"Thank you <@{body['user_id']}>! Your response '{body['text']}' has been recorded.")
+
+    async def show_users(self, ack, body, say):
+        """ Universal command to show a list of users. Depends on which command is triggered."""
+        await ack()
+        command_name = body.get('command')
+        if command_name not in self.USER_LISTS:
+            await say("Unknown setup.")
+        elif command_name == "/audit_unanswered" and not await self._active_session_async():
+            await say("There is no active audit session")
+        else:
+            audit_id = self.audit_session.audit_id if command_name == "/audit_unanswered" else None
+            await say(**await self._users_page_async(command_name, audit_id))
+
+    async def show_users_page(self, ack, body, say):
+        """ Next page of a user list, requested with the button under the previous page """
+        await ack()
+        page = json.loads(body['actions'][0]['value'])
+        # Same access as the command which showed the first page
+        if page['command'] != "/admin_show" and not await asyncio.to_thread(self.roles.is_admin, self._user_id(body)):
+            await say("You are not authorized to perform this action.")
+            return
+        await say(**await self._users_page_async(page['command'], page.get('audit_id'), page['after'], page['number']))
+
+    async def _active_session_async(self):
+        """ Local audit session, an audit opened by another replica is looked up with the async engine """
+        if self.audit_session is not None:
+            return self.audit_session
+        if not await self.async_database_manager.has_active_audit(self.audit_name):
+            return None
+        # Taking the audit over loads its state and schedules its rounds, done once per replica
+        return await asyncio.to_thread(self._active_session)
+
+    async def _users_page_async(self, command_name, audit_id=None, after_id=None, number=1):
+        """ Render one page of a user list, see AuditBot._users_page """
+        limit = UserListPage.PAGE_SIZE + 1
+        if command_name == "/audit_unanswered":
+            user_ids = await self.async_database_manager.get_unanswered_page(audit_id, limit, after_id)
+        else:
+            # The role cache reloads from the database once its TTL has passed
+            user_ids = await asyncio.to_thread(self._role_page, command_name, limit, after_id)
+        return self._render_users_page(command_name, audit_id, user_ids, number)
+
+    async def _run(self):
+        self.dispatcher.loop = asyncio.get_running_loop()
+        self.handler = AsyncSocketModeHandler(self.app, self.SLACK_APP_TOKEN)
+        self._start_workers()
+        connect_started = time.perf_counter()
+        await self.handler.connect_async()
+        self._connected(connect_started)
+        await asyncio.Event().wait()
+
+    def start(self):
+        """ Connects to Slack in socket mode"""
+        asyncio.run(self._run())
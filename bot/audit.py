@@ -1,10 +1,20 @@
 import os
 import time
+import zlib
+import random
+import asyncio
 import datetime
-import pandas as pd
+import threading
 import typing as tp
 
 from db import DataBaseManager
+from dispatcher import MessageDispatcher, DispatchReport
+from scheduler import ReminderScheduler
+from ingest import AnswerQueue
+from dashboard import AuditDashboard
+from reminders import ReminderPolicy, ReminderQueue
+from slack_sdk.errors import SlackApiError
+from metrics import ROUND_SECONDS, ROUND_MESSAGES, PROFILER, log_json
 
 
 class TimeFormatter:
@@ -42,120 +52,604 @@ class AuditStorage:
         """
         os.makedirs(folder_path, mode=0o777, exist_ok=True)
 
-    @staticmethod
-    def save_audit_summary(table: tp.List, table_name: str, audits_folder: str) -> str:
-        """
-        Save audit summary to Excel file.
-
-        :param table: Audit table data
-        :param table_name: Name of the audit table
-        :param audits_folder: Folder to save audit files
-        :return: Path to the saved Excel file
-        """
-        file_name = os.path.join(audits_folder, f"{table_name}.xlsx")
-        columns = ['Name', 'Answer']
-        data = [(tuple(row)[1], tuple(row)[2]) for row in table]
-        df = pd.DataFrame(data, columns=columns)
-        df.to_excel(file_name, index=False)
-        return file_name
-
 
 class AuditSession:
     DEFAULT_AUDITS_FOLDER = 'audit_files'
     DEFAULT_REMINDER_TIME = '2h'
     DEFAULT_REMINDER_MESSAGE = "Kindly reminder!:arrow-up:"
+    # Sent messages are stored every N messages, so a crash loses at most that many
+    NOTIFIED_FLUSH_SIZE = 500
+    # Users of a round are split into shards, each sent by the replica holding its advisory lock
+    DEFAULT_SHARDS = 8
+    # Users due within this many seconds are messaged by the same round
+    MIN_ROUND_INTERVAL = 60
+    # Users of a shard held by another replica are checked again after this many seconds
+    BUSY_SHARD_RETRY = 60
 
     def __init__(
             self,
-            table_name: str,
-            send_message: tp.Callable[[str, str], None],
+            audit_name: str,
+            send_message: tp.Callable[[str, str], bool],
             database_manager: DataBaseManager,
-            reminder: tp.Optional[str] = None
+            scheduler: ReminderScheduler,
+            reminder: tp.Optional[str] = None,
+            dispatcher: tp.Optional[MessageDispatcher] = None,
+            answer_queue: tp.Optional[AnswerQueue] = None,
+            shards: int = DEFAULT_SHARDS,
+            policy: tp.Optional[ReminderPolicy] = None
     ):
         """
         Initialize an audit session.
 
-        :param table_name: Base name for the audit table
+        :param audit_name: Name of the audit
         :param send_message: Function to send messages
-        :param database_handlers: Dictionary of database operation handlers
+        :param database_manager: Database manager
+        :param scheduler: Scheduler running reminder rounds
         :param reminder: Custom reminder time
+        :param dispatcher: Dispatcher used to fan out messages to users
+        :param answer_queue: Queue writing answers in batches, answers are written directly if not set
+        :param shards: Number of parts a round is split into between bot replicas
+        :param policy: Reminder backoff, cap and quiet hours, defaults of ReminderPolicy if not set
         """
         self._is_active = False
         self._responses: tp.Dict = {}
         self._admins = None
+        self._message: tp.Optional[str] = None
+        self._initial_sent = False
+        self._rounds = 0
+        self.started_at: tp.Optional[datetime.datetime] = None
+        self.last_round_at: tp.Optional[datetime.datetime] = None
+
+        # Epoch time of the last message and number of messages per user, and messages not stored yet
+        self._notified: tp.Dict[str, float] = {}
+        self._messages: tp.Dict[str, int] = {}
+        self._notified_buffer: tp.List[tp.Tuple[str, datetime.datetime, int]] = []
+        self._deactivated: tp.List[str] = []
+        self._notified_lock = threading.Lock()
 
-        self.table_name = f"{table_name}_{datetime.datetime.now().strftime('%d%m%Y')}"
+        # Users who have not answered yet, kept in memory instead of running the anti-join every time
+        self._pending: tp.Set[str] = set()
+        # Users who answered, loaded from the database on refresh and kept in memory in between,
+        # so a repeated answer is recognized without a query
+        self._answered: tp.Set[str] = set()
+        self._answered_during_refresh: tp.Optional[tp.Set[str]] = None
+        # Pending users by the time of their next message, with their timezones
+        self._queue = ReminderQueue()
+        self._tz_offsets: tp.Dict[str, tp.Optional[int]] = {}
+        self._refreshed_at = 0.0
+        self._pending_lock = threading.Lock()
+
+        self.audit_id: tp.Optional[int] = None
+        self.audit_name = audit_name
+        self.audit_date = datetime.date.today()
+        self.label = f"{audit_name}_{self.audit_date.strftime('%d%m%Y')}"
         self.reminder_time = TimeFormatter.format_time(reminder or self.DEFAULT_REMINDER_TIME)
 
         self._send_message = send_message
         self._database_manager = database_manager
+        self._scheduler = scheduler
+        self._dispatcher = dispatcher or MessageDispatcher()
+        self._answer_queue = answer_queue
+        self.shards = max(1, shards)
+        self.policy = policy or ReminderPolicy()
+        self.last_report: tp.Optional[DispatchReport] = None
+        self.dashboard: tp.Optional[AuditDashboard] = None
 
         AuditStorage.create_audit_folder(self.DEFAULT_AUDITS_FOLDER)
 
-    def open_session(self, audit_message: str) -> None:
+    @classmethod
+    def resume(
+            cls,
+            schedule: tp.Any,
+            send_message: tp.Callable[[str, str], bool],
+            database_manager: DataBaseManager,
+            scheduler: ReminderScheduler,
+            dispatcher: tp.Optional[MessageDispatcher] = None,
+            answer_queue: tp.Optional[AnswerQueue] = None,
+            shards: int = DEFAULT_SHARDS,
+            policy: tp.Optional[ReminderPolicy] = None
+    ) -> 'AuditSession':
+        """
+        Restore an audit session from its stored schedule and queue its next round.
+        Also used by replicas to take over an audit opened by another replica.
+
+        :param schedule: Row of get_active_schedules(with_state=True)
+        :param send_message: Function to send messages
+        :param database_manager: Database manager
+        :param scheduler: Scheduler running reminder rounds
+        :param dispatcher: Dispatcher used to fan out messages to users
+        :param answer_queue: Queue writing answers in batches
+        :param shards: Number of parts a round is split into between bot replicas
+        :param policy: Reminder backoff, cap and quiet hours
+        :return: Active audit session
         """
-        Open and start the audit session.
+        session = cls(
+            schedule.audit_name, send_message, database_manager, scheduler,
+            dispatcher=dispatcher, answer_queue=answer_queue, shards=shards, policy=policy
+        )
+        session.audit_id = schedule.audit_id
+        session.audit_date = schedule.audit_date
+        session.label = f"{schedule.audit_name}_{schedule.audit_date.strftime('%d%m%Y')}"
+        session.reminder_time = schedule.reminder_seconds
+        session._message = schedule.message
+        session._initial_sent = schedule.initial_sent
+        session._rounds = schedule.rounds
+        session.started_at = schedule.started_at
+        session.last_round_at = schedule.last_round_at
+        notified = zip(schedule.notified_users or [], schedule.notified_at or [], schedule.notified_messages or [])
+        for user_id, notified_at, messages in notified:
+            session._notified[user_id] = notified_at.timestamp()
+            session._messages[user_id] = messages
+        # The loaded state is as fresh as a refresh, the first round does not reload it
+        session._pending = set(schedule.pending_users or [])
+        session._answered = set(schedule.answered_users or [])
+        session._tz_offsets = dict(zip(schedule.pending_users or [], schedule.pending_tz_offsets or []))
+        session._refreshed_at = now = time.time()
+        for user_id in session._pending:
+            session._push(user_id, now)
+        session._is_active = True
+        if schedule.status_ts:
+            session.dashboard = AuditDashboard(session, session._dispatcher, scheduler,
+                                               schedule.status_channel, schedule.status_ts)
+        scheduler.schedule(session.label, session.run_round, schedule.next_run_at.timestamp())
+        return session
+
+    def open_session(self, audit_message: str, status_channel: tp.Optional[str] = None) -> None:
+        """
+        Open the audit session and queue its first round.
 
         :param audit_message: Initial audit message
+        :param status_channel: Channel to post the live status message to
         """
         self._is_active = True
-        self._ensure_table_exists()
-        self._start_audit(audit_message)
+        self._message = audit_message
+        self._initial_sent = False
+        self._rounds = 0
+        self.audit_id = self._database_manager.create_audit(self.audit_name, self.audit_date)
+        self.refresh_pending()
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.started_at = now
+        self._database_manager.save_schedule({
+            'audit_id': self.audit_id,
+            'message': audit_message,
+            'reminder_seconds': self.reminder_time,
+            'next_run_at': now,
+            'initial_sent': False,
+            'is_active': True,
+            'rounds': 0,
+            'last_round_at': None,
+        })
+        if status_channel is not None:
+            self.post_dashboard(status_channel)
+        self._scheduler.schedule(self.label, self.run_round, now.timestamp())
+
+    def post_dashboard(self, channel_id: str) -> None:
+        """
+        Post the live status message of the audit, other replicas edit the same message.
+
+        :param channel_id: Channel or user ID
+        """
+        dashboard = AuditDashboard(self, self._dispatcher, self._scheduler, channel_id)
+        try:
+            dashboard.post()
+        except SlackApiError as e:
+            print(f"Status message of '{self.label}' was not posted: {e.response.get('error')}")
+            return
+        self.dashboard = dashboard
+        self._database_manager.update_schedule(self.audit_id, status_channel=dashboard.channel_id,
+                                               status_ts=dashboard.ts)
 
     def close_session(self) -> None:
         """
-        Close the current audit session.
+        Close the current audit session and stop its reminders.
+        """
+        self.detach()
+        if self._answer_queue is not None:
+            # Stored counts of the closed audit include buffered answers
+            self._answer_queue.flush()
+        self._database_manager.update_schedule(self.audit_id, is_active=False)
+        self._database_manager.close_audit(self.audit_id)
+        if self.dashboard is not None:
+            self.dashboard.close()
+
+    def detach(self) -> None:
+        """
+        Stop reminders of this process only, e.g. when another replica closed the audit.
         """
         self._is_active = False
+        self._scheduler.cancel(self.label)
+        if self.dashboard is not None:
+            self.dashboard.stop()
+        self.flush_notified()
 
-    def _ensure_table_exists(self) -> None:
+    def sync(self, schedule: tp.Any) -> None:
         """
-        Ensure the audit table exists, creating it if necessary.
+        Take over round progress stored by other replicas.
+
+        :param schedule: audit_schedule row
         """
-        table = self._database_manager.check_table_exists(self.table_name)
-        if table is None:
-            self._database_manager.create_audit_table(self.table_name)
+        self._message = schedule.message
+        self.reminder_time = schedule.reminder_seconds
+        self._initial_sent = self._initial_sent or schedule.initial_sent
+        self._rounds = max(self._rounds, schedule.rounds)
+        self.last_round_at = schedule.last_round_at
+        if self.dashboard is None and schedule.status_ts:
+            # Posted by the replica which opened the audit
+            self.dashboard = AuditDashboard(self, self._dispatcher, self._scheduler,
+                                            schedule.status_channel, schedule.status_ts)
 
-    def _start_audit(self, initial_message: str) -> None:
+    def run_round(self) -> tp.Optional[float]:
         """
-        Continuously send audit messages to target users.
+        Message pending users whose next message is due: the audit message to users who did not get it yet,
+        a reminder to the others. Each user's next message is then queued by the reminder policy.
 
-        :param initial_message: First audit message to send
+        :return: Epoch time of the next round, None if the session is closed
         """
-        while self._is_active:
-            target_users = self._get_target_users()
-            for user_id in target_users:
-                self._send_message(user_id, initial_message)
+        if not self._is_active:
+            return None
+        schedule = self._database_manager.get_schedule(self.audit_id)
+        if schedule is None or not schedule.is_active:
+            print(f"Audit '{self.label}' was closed by another replica")
+            self.detach()
+            return None
+        self.sync(schedule)
+
+        if time.time() >= self._refreshed_at + self.reminder_time:
+            # Users or the ignore list may have changed, answers may have been received by other replicas
+            drift = self.refresh_pending()
+            if drift:
+                print(f"Audit '{self.label}' pending users changed by {drift} users since the last refresh")
+        now = time.time()
+        with self._pending_lock:
+            due_users = [user_id for user_id in self._queue.pop_due(now) if user_id in self._pending]
+
+        if due_users:
+            self._rounds += 1
+            round_started = datetime.datetime.now(datetime.timezone.utc)
+            with PROFILER.profile(f'reminder_round {self.label}'), ROUND_SECONDS.time(audit=self.audit_name):
+                try:
+                    self.last_report, skipped_users, busy_shards = self._dispatch_shards(due_users, now)
+                finally:
+                    self.flush_notified()
+            deactivated = self._drop_deactivated()
+            report = self.last_report
+            for result in ('sent', 'failed', 'skipped'):
+                ROUND_MESSAGES.inc(getattr(report, result), audit=self.audit_name, result=result)
+            with self._pending_lock:
+                queued = len(self._queue)
+            log_json('reminder_round', audit=self.label, round=self._rounds, due=len(due_users), sent=report.sent,
+                     failed=report.failed, skipped=report.skipped, deactivated=deactivated, busy_shards=busy_shards,
+                     queued=queued, elapsed=report.elapsed, throughput=report.throughput, **skipped_users)
+            self._initial_sent = True
+            self.last_round_at = round_started
+        if not self._is_active:
+            return None
+
+        next_run = self._next_round_at(now)
+        self._database_manager.update_schedule(
+            self.audit_id,
+            initial_sent=self._initial_sent,
+            rounds=self._rounds,
+            last_round_at=self.last_round_at,
+            next_run_at=datetime.datetime.fromtimestamp(next_run, datetime.timezone.utc)
+        )
+        if due_users and self.dashboard is not None:
+            self.dashboard.changed()
+        return next_run
 
-            initial_message = self.DEFAULT_REMINDER_MESSAGE
-            time.sleep(self.reminder_time)
+    def _next_round_at(self, now: float) -> float:
+        """
+        Time of the next round: when the first queued user is due, or pending users are reloaded.
+
+        :param now: Start of the current round, epoch time
+        :return: Epoch time
+        """
+        next_run = self._refreshed_at + self.reminder_time
+        with self._pending_lock:
+            next_due = self._queue.next_due()
+        if next_due is not None:
+            next_run = min(next_run, next_due)
+        return max(next_run, now + self.MIN_ROUND_INTERVAL)
+
+    def _dispatch_shards(
+            self,
+            due_users: tp.List[str],
+            now: float
+    ) -> tp.Tuple[DispatchReport, tp.Dict[str, int], int]:
+        """
+        Send the round shard by shard. A shard is sent only while its advisory lock is held, and
+        users who answered or were messaged by another replica since they were queued are skipped.
+
+        :param due_users: Users whose next message is due
+        :param now: Round start, epoch time
+        :return: Round report, numbers of users skipped as answered and as already messaged,
+                 number of shards held by other replicas
+        """
+        shards: tp.List[tp.List[str]] = [[] for _ in range(self.shards)]
+        for user_id in due_users:
+            shards[zlib.crc32(user_id.encode()) % self.shards].append(user_id)
+
+        sent = failed = skipped = busy_shards = 0
+        skipped_users = {'answered': 0, 'already_notified': 0}
+        started = time.perf_counter()
+        # Replicas start at different shards, so they do not queue for the same locks
+        for shard in random.sample(range(self.shards), self.shards):
+            if not shards[shard] or not self._is_active:
+                continue
+            with self._database_manager.advisory_lock(self.audit_id, shard) as locked:
+                if not locked:
+                    # Checked again once the other replica stored its messages
+                    busy_shards += 1
+                    self._requeue(shards[shard], now + self.BUSY_SHARD_RETRY)
+                    continue
+                target_users = self._check_shard(shards[shard], now, skipped_users)
+                messages = {user_id: self._messages.get(user_id, 0) for user_id in target_users}
+                groups = (
+                    ([user_id for user_id in target_users if not messages[user_id]], self._message),
+                    ([user_id for user_id in target_users if messages[user_id]], self.DEFAULT_REMINDER_MESSAGE),
+                )
+                try:
+                    for users, message in groups:
+                        if not users:
+                            continue
+                        report = self._dispatcher.dispatch(
+                            users, message, self._tracked_sender(), cancelled=lambda: not self._is_active
+                        )
+                        sent += report.sent
+                        failed += report.failed
+                        skipped += report.skipped
+                finally:
+                    # Stored before the lock is released, so the next holder sees them
+                    self.flush_notified()
+                    self._queue_sent(messages, now)
+        return DispatchReport(sent, failed, time.perf_counter() - started, skipped), skipped_users, busy_shards
+
+    def _check_shard(self, user_ids: tp.List[str], now: float, skipped_users: tp.Dict[str, int]) -> tp.List[str]:
+        """
+        Compare due users of a shard with the database: users who answered through another replica are
+        no longer pending, and users messaged by another replica are queued by the stored messages.
+
+        :param user_ids: Due users of the shard
+        :param now: Round start, epoch time
+        :param skipped_users: Counters of skipped users, updated in place
+        :return: Users to message
+        """
+        answered = self._database_manager.get_answered_users(self.audit_id, user_ids)
+        stored = self._database_manager.get_notifications(self.audit_id, user_ids)
+        target_users = []
+        adopted = []
+        with self._notified_lock:
+            for user_id in user_ids:
+                if user_id in answered:
+                    continue
+                notified_at, messages = stored.get(user_id, (None, 0))
+                if messages > self._messages.get(user_id, 0):
+                    self._notified[user_id] = notified_at.timestamp()
+                    self._messages[user_id] = messages
+                    adopted.append(user_id)
+                else:
+                    target_users.append(user_id)
+        with self._pending_lock:
+            self._answered |= answered
+            self._pending -= answered
+            for user_id in adopted:
+                self._push(user_id, now)
+        skipped_users['answered'] += len(answered)
+        skipped_users['already_notified'] += len(adopted)
+        return target_users
+
+    def _queue_sent(self, messages_before: tp.Dict[str, int], now: float) -> None:
+        """
+        Queue the next message of users the shard was sent to.
+        Users whose message failed are retried after the reminder interval.
 
-    def _get_target_users(self) -> tp.List[str]:
+        :param messages_before: Number of messages per user before the shard was sent
+        :param now: Round start, epoch time
         """
-        Retrieve list of target user IDs for the audit.
+        with self._notified_lock:
+            deactivated = set(self._deactivated)
+            failed = {user_id for user_id, messages in messages_before.items()
+                      if self._messages.get(user_id, 0) == messages} - deactivated
+        with self._pending_lock:
+            for user_id in messages_before.keys() - failed - deactivated:
+                self._push(user_id, now)
+        self._requeue(list(failed), now + self.reminder_time)
+
+    def _requeue(self, user_ids: tp.List[str], due: float) -> None:
+        with self._pending_lock:
+            for user_id in user_ids:
+                self._queue.push(user_id, self.policy.after_quiet_hours(due, self._tz_offsets.get(user_id)))
+
+    def _push(self, user_id: str, now: float) -> None:
+        """
+        Queue the next message of a user by the reminder policy, users who got all messages are not queued.
+        Called with the pending lock held.
+        """
+        due = self.policy.next_due(
+            self._messages.get(user_id, 0), self._notified.get(user_id, 0.0), self.reminder_time,
+            self._tz_offsets.get(user_id), now
+        )
+        if due is None:
+            self._queue.discard(user_id)
+        else:
+            self._queue.push(user_id, due)
+
+    def _drop_deactivated(self) -> int:
+        """
+        Mark users Slack reported as deactivated, they are no longer pending.
+
+        :return: Number of users
+        """
+        with self._notified_lock:
+            deactivated, self._deactivated = self._deactivated, []
+        if not deactivated:
+            return 0
+        print(f"Audit '{self.label}': {len(deactivated)} users were deactivated since the last users sync")
+        self._database_manager.deactivate_users(deactivated)
+        with self._pending_lock:
+            self._pending.difference_update(deactivated)
+        return len(deactivated)
+
+    def _tracked_sender(self) -> tp.Callable:
+        """
+        Wrap send_message to remember every user who got the message,
+        and users the message could not be sent to because they were deactivated.
+
+        :return: Function of the same kind as send_message, blocking or coroutine
+        """
+        send_message = self._send_message
+        if asyncio.iscoroutinefunction(send_message):
+            async def send_async(user_id: str, message: str) -> bool:
+                try:
+                    sent = await send_message(user_id, message)
+                except SlackApiError as e:
+                    return self._mark_deactivated(user_id, e)
+                if sent and self._mark_notified(user_id):
+                    await asyncio.to_thread(self.flush_notified)
+                return sent
+            return send_async
+
+        def send(user_id: str, message: str) -> bool:
+            try:
+                sent = send_message(user_id, message)
+            except SlackApiError as e:
+                return self._mark_deactivated(user_id, e)
+            if sent and self._mark_notified(user_id):
+                self.flush_notified()
+            return sent
+        return send
+
+    def _mark_notified(self, user_id: str) -> bool:
+        """
+        Remember a sent message.
+
+        :return: True if enough messages are buffered to be stored
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self._notified_lock:
+            self._notified[user_id] = now.timestamp()
+            self._messages[user_id] = messages = self._messages.get(user_id, 0) + 1
+            self._notified_buffer.append((user_id, now, messages))
+            return len(self._notified_buffer) >= self.NOTIFIED_FLUSH_SIZE
+
+    def _mark_deactivated(self, user_id: str, error: SlackApiError) -> bool:
+        """
+        Remember a user Slack reported as deactivated, other errors are raised again.
+
+        :return: False, the message was not sent
+        """
+        if error.response.get('error') not in self.policy.DEACTIVATED_ERRORS:
+            raise error
+        with self._notified_lock:
+            self._deactivated.append(user_id)
+        return False
+
+    def flush_notified(self) -> None:
+        """
+        Store buffered message times. On failure they stay buffered for the next flush.
+        """
+        with self._notified_lock:
+            notified, self._notified_buffer = self._notified_buffer, []
+        try:
+            self._database_manager.save_notifications(self.audit_id, notified)
+        except Exception as e:
+            print(f"Audit '{self.label}' could not store {len(notified)} sent messages: {e}")
+            with self._notified_lock:
+                self._notified_buffer = notified + self._notified_buffer
+
+    def _get_target_users(self) -> tp.Dict[str, tp.Optional[int]]:
+        """
+        Retrieve target users of the audit from the database.
+
+        :return: Timezone offset per user ID, None if not known
+        """
+        target_users = self._database_manager.get_users('/audit_unanswered', self.audit_id)
+        return {user.id: user.tz_offset for user in target_users}
+
+    @property
+    def pending_users(self) -> tp.List[str]:
+        """
+        Users who have not answered yet.
 
         :return: List of user IDs
         """
-        target_users = self._database_manager.get_users('/audit_unanswered', self.table_name)
-        return [user.id for user in target_users]
+        with self._pending_lock:
+            return list(self._pending)
 
-    def add_response(self, data: tp.Dict) -> None:
+    def refresh_pending(self) -> int:
         """
-        Add a response to the audit table.
+        Reload pending users from the database, e.g. after users or ignore list changed,
+        and queue their next messages again.
 
-        :param data: Response data
+        :return: Number of users added to or removed from the pending set
+        """
+        with self._pending_lock:
+            self._answered_during_refresh = set()
+        try:
+            if self._answer_queue is not None:
+                self._answer_queue.flush()
+            tz_offsets = self._get_target_users()
+            answered_users = self._database_manager.get_answered_users(self.audit_id)
+        finally:
+            with self._pending_lock:
+                answered, self._answered_during_refresh = self._answered_during_refresh, None
+
+        now = time.time()
+        with self._pending_lock:
+            # Answers recorded while the query was running may be missing from its result
+            answered_users |= answered
+            target_users = set(tz_offsets) - answered_users
+            drift = len(target_users ^ self._pending)
+            self._pending = target_users
+            self._answered = answered_users
+            self._tz_offsets = tz_offsets
+            self._refreshed_at = now
+            self._queue.clear()
+            for user_id in target_users:
+                self._push(user_id, now)
+        return drift
+
+    @property
+    def progress(self) -> tp.Tuple[int, int]:
         """
-        self._database_manager.add_row(self.table_name, data)
+        Counters of the audit, kept in memory.
 
-    def get_audit_summary(self) -> str:
+        :return: Number of users who answered and who did not
         """
-        Generate and save audit summary.
+        with self._pending_lock:
+            return len(self._answered), len(self._pending)
+
+    @property
+    def rounds(self) -> int:
+        return self._rounds
 
-        :return: Path to the saved Excel file
+    def add_response(self, data: tp.Dict) -> bool:
+        """
+        Add a response to the audit. A repeated answer replaces the previous one, both are kept in the history.
+
+        :param data: Response data
+        :return: True if the user had answered before
         """
-        table = self._database_manager.select_table(self.table_name)
-        return AuditStorage.save_audit_summary(
-            table,
-            self.table_name,
-            self.DEFAULT_AUDITS_FOLDER
-        )
\ No newline at end of file
+        with self._pending_lock:
+            replaced = data['id'] in self._answered
+        if self._answer_queue is not None:
+            self._answer_queue.put(self.audit_id, data)
+        else:
+            replaced = bool(self._database_manager.add_responses([{
+                'audit_id': self.audit_id,
+                'user_id': data['id'],
+                'name': data['name'],
+                'answer': data['answer'],
+                'answered_at': datetime.datetime.now(datetime.timezone.utc),
+            }])) or replaced
+        with self._pending_lock:
+            self._answered.add(data['id'])
+            if data['id'] in self._pending:
+                self._pending.discard(data['id'])
+                self._queue.discard(data['id'])
+            if self._answered_during_refresh is not None:
+                self._answered_during_refresh.add(data['id'])
+        if self.dashboard is not None:
+            self.dashboard.changed()
+        return replaced
@@ -0,0 +1,129 @@
+import time
+import datetime
+import threading
+import typing as tp
+
+from slack_sdk.errors import SlackApiError
+
+from scheduler import ReminderScheduler
+
+
+class AuditDashboard:
+    """
+    Status message of an audit, posted once and edited in place with chat.update.
+
+    Changes are coalesced: the message is edited at most once every debounce seconds,
+    however many answers arrive in between. Counters are read from the audit session
+    in memory, no query is run for an edit.
+    """
+    DEFAULT_DEBOUNCE = 5.0
+    # Errors after which the message can not be edited any more
+    GONE_ERRORS = ('message_not_found', 'channel_not_found', 'cant_update_message')
+
+    def __init__(
+            self,
+            session: tp.Any,
+            dispatcher: tp.Any,
+            scheduler: ReminderScheduler,
+            channel_id: str,
+            ts: tp.Optional[str] = None,
+            debounce: float = DEFAULT_DEBOUNCE
+    ):
+        """
+        Initialize dashboard.
+
+        :param session: Audit session providing label, rounds and progress
+        :param dispatcher: Dispatcher used for Slack calls
+        :param scheduler: Scheduler running delayed edits
+        :param channel_id: Channel of the status message
+        :param ts: Timestamp of an already posted status message
+        :param debounce: Minimal number of seconds between two edits
+        """
+        self.channel_id = channel_id
+        self.ts = ts
+        self.debounce = debounce
+        self.edits = 0
+        self.job_id = f'dashboard {session.label}'
+
+        self._session = session
+        self._dispatcher = dispatcher
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._last_edit = 0.0
+
+    def render(self, closed: bool = False) -> str:
+        """
+        Text of the status message.
+
+        :param closed: Render the final state of a closed audit
+        :return: Message text
+        """
+        answered, pending = self._session.progress
+        total = answered + pending
+        percent = answered * 100 // total if total else 0
+        state = "closed" if closed else f"open, reminder round {self._session.rounds}"
+        updated_at = datetime.datetime.now(datetime.timezone.utc)
+        return (
+            f":bar_chart: *Audit {self._session.label}* ({state})\n"
+            f"Answered: {answered} of {total} ({percent}%)\n"
+            f"Waiting for: {pending} users\n"
+            f"Updated at {updated_at.strftime('%H:%M:%S')} UTC"
+        )
+
+    def post(self) -> None:
+        """
+        Post the status message.
+
+        :raises SlackApiError: If the message can not be posted, e.g. the bot is not in the channel
+        """
+        response = self._dispatcher.call('chat_postMessage', channel=self.channel_id, text=self.render())
+        # Posting to a user ID opens a DM, later edits need the channel ID
+        self.channel_id = response.get('channel') or self.channel_id
+        self.ts = response['ts']
+        self._last_edit = time.time()
+
+    def changed(self) -> None:
+        """
+        Request an edit. Edits requested before the scheduled one runs are merged into it.
+        """
+        with self._lock:
+            if self._scheduled or self.ts is None:
+                return
+            self._scheduled = True
+            due_at = max(time.time(), self._last_edit + self.debounce)
+        self._scheduler.schedule(self.job_id, self._edit, due_at)
+
+    def close(self) -> None:
+        """
+        Stop edits and show the final state.
+        """
+        self.stop()
+        if self.ts is not None:
+            self._update(self.render(closed=True))
+
+    def stop(self) -> None:
+        """
+        Stop edits of this process, e.g. when another replica closed the audit.
+        """
+        self._scheduler.cancel(self.job_id)
+        with self._lock:
+            self._scheduled = False
+
+    def _edit(self) -> None:
+        with self._lock:
+            # Changes from now on schedule the next edit
+            self._scheduled = False
+            self._last_edit = time.time()
+        self._update(self.render())
+        return None
+
+    def _update(self, text: str) -> None:
+        try:
+            self._dispatcher.call('chat_update', channel=self.channel_id, ts=self.ts, text=text)
+            self.edits += 1
+        except SlackApiError as e:
+            error = e.response.get('error')
+            print(f"Status message of '{self._session.label}' was not updated: {error}")
+            if error in self.GONE_ERRORS:
+                self.ts = None
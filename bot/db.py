@@ -1,17 +1,37 @@
-from sqlalchemy import create_engine, Column, String, Boolean, MetaData, Table, insert, select
+from sqlalchemy import (create_engine, Column, String, Boolean, Integer, Text, Date, DateTime, ForeignKey, MetaData,
+                        Table, UniqueConstraint, PrimaryKeyConstraint, select, update, inspect, literal_column,
+                        literal, func, text, and_, or_, any_, cast, case, Index)
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by, ARRAY
 from sqlalchemy.orm import declarative_base, sessionmaker
 from custom_exceptions import EnvironmentVarException
-from sqlalchemy.exc import SQLAlchemyError
+from metrics import instrument_methods, DB_SECONDS, DB_ERRORS, DB_TABLE_CACHE
+from sqlalchemy.exc import ProgrammingError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import exists
 import typing as tp
+import threading
+import contextlib
+import datetime
+import time
 import os
 
 
+Base = declarative_base()
+
+
 class DatabaseConfig:
     """
     Manage database configuration and connection setup.
     """
     REQUIRED_VARS = ('POSTGRES_HOST', 'POSTGRES_USER', 'POSTGRES_PASSWORD', 'POSTGRES_DB')
+    # Optional connection pool settings: environment variable -> (create_engine argument, default)
+    POOL_VARS = {
+        'POSTGRES_POOL_SIZE': ('pool_size', 5),
+        'POSTGRES_MAX_OVERFLOW': ('max_overflow', 10),
+        'POSTGRES_POOL_TIMEOUT': ('pool_timeout', 30),
+        'POSTGRES_POOL_RECYCLE': ('pool_recycle', 1800),
+        'POSTGRES_POOL_PRE_PING': ('pool_pre_ping', True),
+    }
 
     @classmethod
     def validate_environment(cls) -> tp.Dict[str, str]:
@@ -31,41 +51,153 @@ class DatabaseConfig:
         return config
 
     @classmethod
-    def get_database_url(cls, config: tp.Dict[str, str]) -> str:
+    def get_database_url(cls, config: tp.Dict[str, str], driver: tp.Optional[str] = None) -> str:
         """
         Generate database URL from configuration.
 
         :param config: Database configuration dictionary
+        :param driver: SQLAlchemy driver name, e.g. 'asyncpg', default driver if not set
         :return: SQLAlchemy database connection URL
         """
+        scheme = f'postgresql+{driver}' if driver else 'postgresql'
         return (
-            f'postgresql://{config["POSTGRES_USER"]}:'
+            f'{scheme}://{config["POSTGRES_USER"]}:'
             f'{config["POSTGRES_PASSWORD"]}@'
             f'{config["POSTGRES_HOST"]}/'
             f'{config["POSTGRES_DB"]}'
         )
 
+    @classmethod
+    def get_pool_options(cls) -> tp.Dict[str, tp.Any]:
+        """
+        Read connection pool settings from environment variables.
+
+        :return: Keyword arguments for create_engine
+        :raises EnvironmentVarException: If a value can not be parsed
+        """
+        options = {}
+        for env_var, (option, default) in cls.POOL_VARS.items():
+            value = os.environ.get(env_var)
+            if not value:
+                options[option] = default
+            elif isinstance(default, bool):
+                options[option] = value.strip().lower() in ('1', 'true', 'yes', 'on')
+            else:
+                try:
+                    options[option] = int(value)
+                except ValueError:
+                    raise EnvironmentVarException(f'Environment variable "{env_var}" must be an integer')
+        return options
+
+
+class PoolMetrics:
+    """
+    Counters of connection checkouts from the pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
 
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    Queue pool measuring how long callers wait for a connection.
+    """
+    metrics: tp.Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_timeout()
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self) -> 'MeteredQueuePool':
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+@instrument_methods(DB_SECONDS, DB_ERRORS)
 class DataBaseManager:
     """
     Manages database operations and user-related queries
     """
+    SYNC_CHUNK_SIZE = 1000
+    # Number of audits stored in one audit_responses partition
+    AUDIT_PARTITION_SIZE = 100
+    # Postgres NOTIFY channel announcing admin and ignore changes to other bot replicas
+    ROLES_CHANNEL = 'user_roles'
+    # Bumped when tables, indexes or SCHEMA_UPGRADES change, so create_table prepares the schema again
+    SCHEMA_VERSION = 5
+    # Columns added after the first release, create_all does not add columns to existing tables
+    SCHEMA_UPGRADES = (
+        'ALTER TABLE audit_schedule ADD COLUMN IF NOT EXISTS rounds INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE audit_schedule ADD COLUMN IF NOT EXISTS last_round_at TIMESTAMP WITH TIME ZONE',
+        'ALTER TABLE audits ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()',
+        'ALTER TABLE audits ADD COLUMN IF NOT EXISTS response_count INTEGER',
+        'ALTER TABLE audits ADD COLUMN IF NOT EXISTS target_count INTEGER',
+        # Closed before counts were stored, their targets are not known
+        'UPDATE audits SET response_count = (SELECT count(*) FROM audit_responses WHERE audit_id = audits.id) '
+        'WHERE closed_at IS NOT NULL AND response_count IS NULL',
+        'ALTER TABLE audit_schedule ADD COLUMN IF NOT EXISTS status_channel VARCHAR',
+        'ALTER TABLE audit_schedule ADD COLUMN IF NOT EXISTS status_ts VARCHAR',
+        'ALTER TABLE users ADD COLUMN IF NOT EXISTS tz_offset INTEGER',
+        'ALTER TABLE audit_notifications ADD COLUMN IF NOT EXISTS messages INTEGER NOT NULL DEFAULT 1',
+        # Answers stored before the history was kept are its first revisions
+        'INSERT INTO audit_answer_history (audit_id, user_id, answered_at, answer) '
+        'SELECT audit_id, user_id, answered_at, answer FROM audit_responses ON CONFLICT DO NOTHING',
+    )
 
-    def __init__(self, database_url):
+    def __init__(self, database_url, pool_options: tp.Optional[tp.Dict[str, tp.Any]] = None):
         """
         Initialize database engine and session.
 
         :param database_url: SQLAlchemy database connection URL
+        :param pool_options: Connection pool arguments for create_engine, see DatabaseConfig.get_pool_options
         """
-        self.engine = create_engine(database_url, echo=False)
-        self.Base = declarative_base()
+        self.pool_metrics = PoolMetrics()
+        self.engine = create_engine(database_url, echo=False, poolclass=MeteredQueuePool, **(pool_options or {}))
+        self.engine.pool.metrics = self.pool_metrics
+        self.Base = Base
         self.Session = sessionmaker(bind=self.engine)
 
-    class User(declarative_base()):
+        # Reflected tables are kept in memory, so each call does not reflect the whole schema
+        self._metadata = MetaData()
+        self._tables: tp.Dict[str, Table] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._partitions: tp.Set[int] = set()
+        # Called with (user_id, is_admin, is_ignore) tuples after roles are changed
+        self.role_listeners: tp.List[tp.Callable[[tp.List[tp.Tuple[str, bool, bool]]], None]] = []
+
+    class User(Base):
         """
         User model representing the users table.
         """
         __tablename__ = 'users'
+        __table_args__ = (
+            Index('users_name_idx', 'name'),
+        )
 
         id = Column(String, primary_key=True, nullable=False)
         name = Column(String, nullable=False)
@@ -73,30 +205,312 @@ class DataBaseManager:
         is_deleted = Column(Boolean)
         is_admin = Column(Boolean, default=False)
         is_ignore = Column(Boolean, default=False)
+        # Offset of the user's Slack timezone from UTC, seconds
+        tz_offset = Column(Integer)
+
+    class DmChannel(Base):
+        """
+        Direct message channel opened by the bot for a user.
+        """
+        __tablename__ = 'dm_channels'
+
+        user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True, nullable=False)
+        channel_id = Column(String, nullable=False)
+
+    class Audit(Base):
+        """
+        Catalogue of audits, one row per audit name and day.
+        Counts are stored when the audit is closed, updated_at changes with every stored answer.
+        """
+        __tablename__ = 'audits'
+        __table_args__ = (
+            UniqueConstraint('name', 'audit_date'),
+            Index('audits_name_id_idx', 'name', 'id'),
+        )
+
+        id = Column(Integer, primary_key=True, autoincrement=True)
+        name = Column(String, nullable=False)
+        audit_date = Column(Date, nullable=False)
+        created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+        closed_at = Column(DateTime(timezone=True))
+        updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+        response_count = Column(Integer)
+        target_count = Column(Integer)
+
+    class AuditResponse(Base):
+        """
+        Answers of all audits, partitioned by range of audit_id.
+        """
+        __tablename__ = 'audit_responses'
+        __table_args__ = (
+            PrimaryKeyConstraint('audit_id', 'user_id'),
+            {'postgresql_partition_by': 'RANGE (audit_id)'},
+        )
+
+        audit_id = Column(Integer, ForeignKey('audits.id'), nullable=False)
+        user_id = Column(String, nullable=False)
+        name = Column(String, nullable=False)
+        answer = Column(String, nullable=False)
+        answered_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    class AuditAnswerHistory(Base):
+        """
+        Every answer given in an audit, also the ones replaced by a later answer of the same user.
+        User names are kept in audit_responses only.
+        """
+        __tablename__ = 'audit_answer_history'
+        __table_args__ = (
+            PrimaryKeyConstraint('audit_id', 'user_id', 'answered_at'),
+        )
+
+        audit_id = Column(Integer, ForeignKey('audits.id'), nullable=False)
+        user_id = Column(String, nullable=False)
+        answered_at = Column(DateTime(timezone=True), nullable=False)
+        answer = Column(String, nullable=False)
+
+    class AuditSchedule(Base):
+        """
+        Reminder schedule of an audit, kept so reminders survive restarts.
+        """
+        __tablename__ = 'audit_schedule'
+
+        audit_id = Column(Integer, ForeignKey('audits.id'), primary_key=True, nullable=False)
+        message = Column(Text, nullable=False)
+        reminder_seconds = Column(Integer, nullable=False)
+        next_run_at = Column(DateTime(timezone=True), nullable=False)
+        initial_sent = Column(Boolean, nullable=False, default=False)
+        is_active = Column(Boolean, nullable=False, default=True)
+        rounds = Column(Integer, nullable=False, default=0)
+        last_round_at = Column(DateTime(timezone=True))
+        # Live status message of the audit, edited as answers come in
+        status_channel = Column(String)
+        status_ts = Column(String)
+
+    class AuditNotification(Base):
+        """
+        Messages sent to a user in an open audit: time of the last one and their number,
+        so a restarted bot or another replica continues the user's reminders where they stopped.
+        """
+        __tablename__ = 'audit_notifications'
+        __table_args__ = (
+            PrimaryKeyConstraint('audit_id', 'user_id'),
+        )
+
+        audit_id = Column(Integer, ForeignKey('audits.id'), nullable=False)
+        user_id = Column(String, nullable=False)
+        notified_at = Column(DateTime(timezone=True), nullable=False)
+        messages = Column(Integer, nullable=False, server_default=text('1'))
+
+    class SchemaVersion(Base):
+        """
+        Versions of the schema prepared by create_table.
+        """
+        __tablename__ = 'schema_version'
+
+        version = Column(Integer, primary_key=True, nullable=False)
+        prepared_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def get_schema_version(self) -> int:
+        """
+        Latest schema version prepared in the database.
+
+        :return: Version number, 0 if the schema was never prepared
+        """
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(select(func.max(self.SchemaVersion.version))).scalar() or 0
+        except ProgrammingError:
+            # Table does not exist yet
+            return 0
 
     def create_table(self) -> None:
-        """Create all defined table in database."""
+        """
+        Create all defined table in database, if not exists.
+        Skipped with one query when the schema of this version was already prepared, e.g. on restart.
+        """
+        if self.get_schema_version() >= self.SCHEMA_VERSION:
+            return
         self.Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            for statement in self.SCHEMA_UPGRADES:
+                conn.execute(text(statement))
+        # create_all skips indexes of existing tables, e.g. added to users after the table was created
+        for model in (self.User, self.Audit):
+            for index in model.__table__.indexes:
+                index.create(self.engine, checkfirst=True)
+        with self.engine.begin() as conn:
+            conn.execute(
+                pg_insert(self.SchemaVersion.__table__).values(version=self.SCHEMA_VERSION)
+                .on_conflict_do_nothing()
+            )
 
     def drop_tables(self) -> None:
         """Drop all tables in the database."""
         self.Base.metadata.drop_all(self.engine)
 
-    def create_audit_table(self, audit_name: str) -> None:
+    def create_audit(self, name: str, audit_date: datetime.date) -> int:
+        """
+        Register an audit in the catalogue. An audit with the same name and day is reopened.
+
+        :param name: Audit name
+        :param audit_date: Day of the audit
+        :return: Audit ID
+        """
+        table = self.Audit.__table__
+        statement = pg_insert(table).values(name=name, audit_date=audit_date)
+        statement = statement.on_conflict_do_update(
+            index_elements=['name', 'audit_date'],
+            set_={'closed_at': None, 'response_count': None, 'target_count': None, 'updated_at': func.now()}
+        ).returning(table.c.id)
+        with self.engine.begin() as conn:
+            audit_id = conn.execute(statement).scalar_one()
+            self._ensure_partition(conn, audit_id)
+        return audit_id
+
+    def _ensure_partition(self, conn, audit_id: int) -> None:
+        """
+        Create audit_responses partition holding the audit, if not exists.
+
+        :param conn: Open connection
+        :param audit_id: Audit ID
+        """
+        number = audit_id // self.AUDIT_PARTITION_SIZE
+        if number in self._partitions:
+            return
+        lower = number * self.AUDIT_PARTITION_SIZE
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS audit_responses_p{number} PARTITION OF audit_responses '
+            f'FOR VALUES FROM ({lower}) TO ({lower + self.AUDIT_PARTITION_SIZE})'
+        ))
+        self._partitions.add(number)
+
+    def _audit_counts(self, audit_id: tp.Any) -> tp.Tuple[tp.Any, tp.Any]:
+        """
+        Count answers and target users of an audit: users who answered and active, not ignored users who did not.
+
+        :param audit_id: Audit ID or a column the subqueries are correlated to
+        :return: Scalar subqueries of response count and target count
+        """
+        users = self.User.__table__
+        responses = self.AuditResponse.__table__
+        response_count = (
+            select(func.count()).select_from(responses).where(responses.c.audit_id == audit_id).scalar_subquery()
+        )
+        unanswered = (
+            select(func.count()).select_from(users)
+            .where(users.c.is_deleted.is_(False), users.c.is_ignore.is_(False))
+            # Correlated to the outer audits row too, not only to users
+            .where(~exists().where(and_(responses.c.audit_id == audit_id, responses.c.user_id == users.c.id))
+                   .correlate_except(responses))
+            .scalar_subquery()
+        )
+        return response_count, response_count + unanswered
+
+    def close_audit(self, audit_id: int) -> None:
+        """
+        Mark an audit as closed, store its counts and forget its notifications.
+
+        :param audit_id: Audit ID
+        """
+        table = self.Audit.__table__
+        notifications = self.AuditNotification.__table__
+        response_count, target_count = self._audit_counts(table.c.id)
+        with self.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.id == audit_id).values(
+                closed_at=func.now(), updated_at=func.now(),
+                response_count=response_count, target_count=target_count
+            ))
+            conn.execute(notifications.delete().where(notifications.c.audit_id == audit_id))
+
+    def add_responses(
+            self,
+            rows: tp.List[tp.Dict],
+            history: tp.Optional[tp.List[tp.Dict]] = None
+    ) -> tp.Set[tp.Tuple[int, str]]:
         """
-        Create a new audit table.
+        Store answers, their revisions and the audit change time with one statement.
+        A repeated answer of a user replaces the previous one, an answer replayed from
+        the answer log does not replace a newer one and is not added to the history twice.
 
-        :param audit_name: Name of the audit table
-        :return: Create SQLAlchemy Table object
+        :param rows: Dictionaries with audit_id, user_id, name, answer and answered_at, one per audit and user
+        :param history: All revisions of the answers, the rows themselves if not set
+        :return: (audit ID, user ID) of answers which replaced an earlier answer
         """
-        metadata = MetaData()
-        audit_table = Table(
-            audit_name, metadata,
-            Column('id', String, primary_key=True, nullable=False),
-            Column('name', String, nullable=False),
-            Column('answer', String, nullable=False)
+        table = self.AuditResponse.__table__
+        history_table = self.AuditAnswerHistory.__table__
+        audits = self.Audit.__table__
+        revisions = pg_insert(history_table).values([
+            {column: row[column] for column in ('audit_id', 'user_id', 'answered_at', 'answer')}
+            for row in (rows if history is None else history)
+        ]).on_conflict_do_nothing()
+        # Cached report files of these audits are outdated
+        touched = update(audits).where(
+            audits.c.id.in_(sorted({row['audit_id'] for row in rows}))
+        ).values(updated_at=func.now())
+
+        statement = pg_insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['audit_id', 'user_id'],
+            set_={
+                'name': statement.excluded.name,
+                'answer': statement.excluded.answer,
+                'answered_at': statement.excluded.answered_at,
+            },
+            where=table.c.answered_at <= statement.excluded.answered_at
+        ).returning(
+            table.c.audit_id, table.c.user_id,
+            # Subqueries of RETURNING see the table as it was before the statement,
+            # xmax can not be read from a partitioned table
+            literal_column('EXISTS (SELECT 1 FROM audit_responses AS previous '
+                           'WHERE previous.audit_id = audit_responses.audit_id '
+                           'AND previous.user_id = audit_responses.user_id)').label('replaced')
         )
-        audit_table.create(self.engine)
+        # Writes in WITH are run by the same statement, whether the outer one reads them or not
+        statement = statement.add_cte(revisions.cte('revisions'), touched.cte('touched'))
+        with self.engine.begin() as conn:
+            return {(audit_id, user_id) for audit_id, user_id, replaced in conn.execute(statement) if replaced}
+
+    def list_audits(
+            self,
+            limit: int,
+            before_id: tp.Optional[int] = None,
+            name: tp.Optional[str] = None
+    ) -> tp.List[tp.Any]:
+        """
+        Read a page of the audit catalogue, newest first.
+        Pages continue from the last ID of the previous page, so every page is an index range scan.
+
+        :param limit: Number of audits
+        :param before_id: Return audits older than this ID
+        :param name: Return audits of this name only
+        :return: audits rows, counts of open audits are counted live. Target count of migrated audits is None
+        """
+        audits = self.Audit.__table__
+        response_count, target_count = self._audit_counts(audits.c.id)
+        query = select(
+            audits.c.id, audits.c.name, audits.c.audit_date, audits.c.created_at, audits.c.closed_at,
+            audits.c.updated_at,
+            # Subqueries are evaluated for open audits only
+            case((audits.c.closed_at.is_(None), response_count), else_=audits.c.response_count).label('response_count'),
+            case((audits.c.closed_at.is_(None), target_count), else_=audits.c.target_count).label('target_count'),
+        ).order_by(audits.c.id.desc()).limit(limit)
+        if before_id is not None:
+            query = query.where(audits.c.id < before_id)
+        if name is not None:
+            query = query.where(audits.c.name == name)
+        with self.engine.connect() as conn:
+            return conn.execute(query).all()
+
+    def get_audit(self, audit_id: int) -> tp.Optional[tp.Any]:
+        """
+        Look up an audit in the catalogue.
+
+        :param audit_id: Audit ID
+        :return: audits row, None if the audit does not exist
+        """
+        audits = self.Audit.__table__
+        with self.engine.connect() as conn:
+            return conn.execute(select(audits).where(audits.c.id == audit_id)).first()
 
     def update_users(
             self,
@@ -104,110 +518,180 @@ class DataBaseManager:
             to_admin: bool = False,
             to_ignore: bool = False,
             by_name: bool = False,
-    ) -> tp.List[str]:
+    ) -> tp.Tuple[tp.List[tp.Dict], tp.List[str]]:
         """
         Update user information in the database.
+        By name, admin and ignore flags of all given users are toggled by one statement,
+        and the changes are announced on ROLES_CHANNEL and to role_listeners.
+        Names shared by several users are not updated, those users have to be given with an ID.
 
         :param users: List of user data
         :param to_admin: Toggle admin status
         :param to_ignore: Toggle ignore status
-        :param by_name: Update by username instead of ID
-        :return: List of not found users
+        :param by_name: Update by username, or by ID for users given with an ID
+        :return: List of not found users and list of names shared by several users
         """
+        if not by_name:
+            self.sync_users(users)
+            return [], []
 
-        not_found_users = []
-        with self.Session() as session:
-            try:
-                for user in users:
-                    if by_name:
-                        not_found_users.extend(
-                            self._update_user_by_name(session, user, to_admin, to_ignore)
-                        )
-                    else:
-                        not_found_users.extend(
-                            self._update_or_create_user(session, user)
-                        )
-                session.commit()
-            except SQLAlchemyError as e:
-                session.rollback()
-                raise
-        return not_found_users
-
-    def _update_user_by_name(
-            self,
-            session,
-            user: dict,
-            to_admin: bool,
-            to_ignore: bool
-    ) -> tp.List[tp.Dict]:
-        """
-        Update user status by username.
+        users_table = self.User.__table__
+        user_ids = sorted({user['id'] for user in users if user.get('id')})
+        names = sorted({user['name'] for user in users if not user.get('id') and user.get('name')})
+        if not user_ids and not names:
+            return list(users), []
 
-        :param session: SQLAlchemy session
-        :param user: Username
-        :param to_admin: Toggle admin status
-        :param to_ignore: Toggle ignore status
-        :return: List of not found users
-        """
-        not_found_users = []
-        existing_user = session.query(self.User).filter_by(name=user.get('name')).first()
+        toggles = {}
+        if to_admin:
+            toggles['is_admin'] = ~users_table.c.is_admin
+        if to_ignore:
+            toggles['is_ignore'] = ~users_table.c.is_ignore
 
-        if existing_user:
-            if to_ignore:
-                existing_user.is_ignore = not existing_user.is_ignore
-            if to_admin:
-                existing_user.is_admin = not existing_user.is_admin
+        # Mentions carry the ID, other users are resolved by the indexed name column when the name is unique
+        unique_names = (
+            select(users_table.c.name)
+            .where(users_table.c.name == any_(literal(names, ARRAY(String))))
+            .group_by(users_table.c.name)
+            .having(func.count() == 1)
+        )
+        matched = or_(
+            users_table.c.id == any_(literal(user_ids, ARRAY(String))),
+            users_table.c.name.in_(unique_names),
+        )
+        if toggles:
+            changed = (
+                update(users_table).where(matched).values(**toggles)
+                .returning(users_table.c.id, users_table.c.name, users_table.c.is_admin, users_table.c.is_ignore)
+                .cte('changed')
+            )
+            # Notifications are delivered to listeners on commit only
+            payload = func.json_build_object(
+                'id', changed.c.id, 'is_admin', changed.c.is_admin, 'is_ignore', changed.c.is_ignore
+            )
+            statement = select(changed, func.pg_notify(self.ROLES_CHANNEL, cast(payload, Text)))
         else:
-            not_found_users.append(user)
+            statement = select(users_table.c.id, users_table.c.name, users_table.c.is_admin, users_table.c.is_ignore)
+            statement = statement.where(matched)
 
-        return not_found_users
+        with self.engine.begin() as conn:
+            rows = conn.execute(statement).all()
+            ambiguous_names = conn.execute(
+                select(users_table.c.name)
+                .where(users_table.c.name == any_(literal(names, ARRAY(String))))
+                .group_by(users_table.c.name)
+                .having(func.count() > 1)
+                .order_by(users_table.c.name)
+            ).scalars().all() if names else []
 
-    def _update_or_create_user(
+        found_ids = {row.id for row in rows}
+        found_names = {row.name for row in rows}.union(ambiguous_names)
+        not_found_users = [
+            user for user in users
+            if (user['id'] not in found_ids if user.get('id') else user.get('name') not in found_names)
+        ]
+
+        roles = [(row.id, row.is_admin, row.is_ignore) for row in rows]
+        if toggles and roles:
+            for listener in self.role_listeners:
+                listener(roles)
+        return not_found_users, ambiguous_names
+
+    def sync_users(
             self,
-            session,
-            user: tp.Dict
-    ) -> tp.List[str]:
+            users: tp.Iterable[tp.Dict],
+            chunk_size: int = SYNC_CHUNK_SIZE
+    ) -> tp.Dict[str, int]:
         """
-        Update existing user or create new user.
+        Insert new Slack users and update is_deleted and tz_offset of known ones in bulk.
+        Every chunk is written by one INSERT ... ON CONFLICT DO UPDATE statement.
 
-        :param session: SQLAlchemy session
-        :param user: User data dictionary
-        :return: List of not found users
+        :param users: Slack user data, as returned by users.list
+        :param chunk_size: Number of users per statement
+        :return: Number of added, reactivated, deactivated and unchanged users
         """
-        if user.get('is_bot') or user.get('id') == 'USLACKBOT':
-            return []
+        summary = {'added': 0, 'reactivated': 0, 'deactivated': 0, 'unchanged': 0}
+        rows = {}
+        for user in users:
+            if user.get('is_bot') or user.get('id') == 'USLACKBOT':
+                continue
+            rows[user.get('id')] = {
+                'id': user.get('id'),
+                'name': user.get('name'),
+                'real_name': user.get('profile', {}).get('real_name', ''),
+                'is_deleted': user.get('deleted', False),
+                'is_admin': False,
+                'is_ignore': False,
+                'tz_offset': user.get('tz_offset'),
+            }
 
-        new_db_user = self.User(
-            id=user.get('id'),
-            name=user.get('name'),
-            real_name=user.get('profile', {}).get('real_name', ''),
-            is_deleted=user.get('deleted', False)
-        )
+        table = self.User.__table__
+        rows = list(rows.values())
+        with self.engine.begin() as conn:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                statement = pg_insert(table).values(chunk)
+                # Subqueries of RETURNING see the table as it was before the statement
+                was_deleted = literal_column('(SELECT previous.is_deleted FROM users AS previous '
+                                             'WHERE previous.id = users.id)')
+                statement = statement.on_conflict_do_update(
+                    index_elements=['id'],
+                    # Users given without a timezone keep the known one
+                    set_={'is_deleted': statement.excluded.is_deleted,
+                          'tz_offset': func.coalesce(statement.excluded.tz_offset, table.c.tz_offset)},
+                    where=or_(table.c.is_deleted.is_distinct_from(statement.excluded.is_deleted),
+                              and_(statement.excluded.tz_offset.is_not(None),
+                                   table.c.tz_offset.is_distinct_from(statement.excluded.tz_offset)))
+                ).returning(table.c.is_deleted, literal_column('xmax = 0').label('inserted'),
+                            table.c.is_deleted.is_distinct_from(was_deleted).label('status_changed'))
 
-        existing_user = session.query(self.User).filter_by(id=new_db_user.id).first()
+                # Rows without changes are skipped by the WHERE clause and are not returned
+                changed = conn.execute(statement).all()
+                for is_deleted, inserted, status_changed in changed:
+                    if inserted:
+                        summary['added'] += 1
+                    elif not status_changed:
+                        # Only the timezone changed
+                        summary['unchanged'] += 1
+                    elif is_deleted:
+                        summary['deactivated'] += 1
+                    else:
+                        summary['reactivated'] += 1
+                summary['unchanged'] += len(chunk) - len(changed)
+        return summary
 
-        if existing_user:
-            if existing_user.is_deleted != new_db_user.is_deleted:
-                existing_user.is_deleted = new_db_user.is_deleted
-                print(f"User '{new_db_user.name}' found. Updating is_deleted to {new_db_user.is_deleted}.")
-        else:
-            session.add(new_db_user)
+    def iter_report_rows(self, audit_id: int, batch_size: int = SYNC_CHUNK_SIZE) -> tp.Iterator[tp.Any]:
+        """
+        Stream answers of an audit with user real names through a server-side cursor.
 
-        return []
+        :param audit_id: Audit ID
+        :param batch_size: Rows fetched from the server at once
+        :return: Iterator of (name, real_name, answer, answered_at) rows
+        """
+        responses = self.AuditResponse.__table__
+        users = self.User.__table__
+        statement = (
+            select(responses.c.name, users.c.real_name, responses.c.answer, responses.c.answered_at)
+            .select_from(responses.outerjoin(users, users.c.id == responses.c.user_id))
+            .where(responses.c.audit_id == audit_id)
+            .order_by(responses.c.answered_at)
+        )
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+            yield from result
 
     def get_users(
             self,
             command_name: str,
-            second_table: str = None
+            audit_id: tp.Optional[int] = None
     ) -> tp.Union[tp.List[tp.Type[User]], str]:
         """
         Retrieve users based on different criteria.
 
         :param command_name: Type of user query
-        :param second_table: Secondary table name for specific queries
+        :param audit_id: Audit ID for audit specific queries
         :return: List of users or error message
         """
-        second_table = self.check_table_exists(second_table)
+        responses = self.AuditResponse
         with self.Session() as session:
             if command_name == '/ignore_show':
                 return session.query(self.User).filter_by(is_ignore=True).all()
@@ -223,55 +707,398 @@ class DataBaseManager:
                     session.query(self.User)
                     .filter_by(is_deleted=False)
                     .filter_by(is_ignore=False)
-                    .filter(~exists().where(second_table.c.id == self.User.id))
+                    .filter(~exists().where(and_(
+                        responses.audit_id == audit_id,
+                        responses.user_id == self.User.id
+                    )))
                     .all()
                 )
 
         return "Unknown setup."
 
+    def get_unanswered_page(self, audit_id: int, limit: int, after_id: tp.Optional[str] = None) -> tp.List[str]:
+        """
+        Read a page of users who have not answered an audit, ordered by user ID.
+        Pages continue after the last ID of the previous page, so every page is a range scan of the primary key.
+
+        :param audit_id: Audit ID
+        :param limit: Number of users
+        :param after_id: Return users with a greater ID
+        :return: User IDs
+        """
+        with self.engine.connect() as conn:
+            return list(conn.execute(self.unanswered_page_query(audit_id, limit, after_id)).scalars())
+
+    @classmethod
+    def unanswered_page_query(cls, audit_id: int, limit: int, after_id: tp.Optional[str] = None) -> tp.Any:
+        """
+        Query of get_unanswered_page, shared with the async database manager.
+
+        :param audit_id: Audit ID
+        :param limit: Number of users
+        :param after_id: Return users with a greater ID
+        :return: Select statement of user IDs
+        """
+        users = cls.User.__table__
+        responses = cls.AuditResponse.__table__
+        query = (
+            select(users.c.id)
+            .where(users.c.is_deleted.is_(False), users.c.is_ignore.is_(False))
+            .where(~exists().where(and_(responses.c.audit_id == audit_id, responses.c.user_id == users.c.id)))
+            .order_by(users.c.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(users.c.id > after_id)
+        return query
+
+    def get_roles(self) -> tp.Tuple[tp.Set[str], tp.Set[str]]:
+        """
+        Load IDs of admin and ignored users in one query.
+
+        :return: Sets of admin and ignored user IDs
+        """
+        users = self.User.__table__
+        admins, ignored = set(), set()
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(users.c.id, users.c.is_admin, users.c.is_ignore)
+                .where(users.c.is_admin.is_(True) | users.c.is_ignore.is_(True))
+            )
+            for user_id, is_admin, is_ignore in rows:
+                if is_admin:
+                    admins.add(user_id)
+                if is_ignore:
+                    ignored.add(user_id)
+        return admins, ignored
+
     def check_table_exists(self, table_name: str) -> tp.Optional[Table]:
         """
         Check if a table exists in the database.
+        Only the named table is reflected, and found tables are cached.
 
         :param table_name: Name of the table to check
         :return: Table object if exists, None otherwise
         """
-        metadata = MetaData()
-        metadata.reflect(bind=self.engine)
-        return metadata.tables.get(table_name)
+        if table_name is None:
+            return None
+
+        table = self._tables.get(table_name)
+        if table is not None:
+            self.cache_hits += 1
+            DB_TABLE_CACHE.inc(result='hit')
+            return table
+
+        self.cache_misses += 1
+        DB_TABLE_CACHE.inc(result='miss')
+        if not inspect(self.engine).has_table(table_name):
+            return None
+
+        table = Table(table_name, self._metadata, autoload_with=self.engine, extend_existing=True)
+        self._tables[table_name] = table
+        return table
+
+    def invalidate_table_cache(self, table_name: tp.Optional[str] = None) -> None:
+        """
+        Drop cached table metadata, so the next lookup reflects it again.
+
+        :param table_name: Name of the table to forget, or None to clear the whole cache
+        """
+        if table_name is None:
+            self._tables.clear()
+            self._metadata.clear()
+            return
+
+        table = self._tables.pop(table_name, None)
+        if table is not None:
+            self._metadata.remove(table)
+
+    def pool_stats(self) -> tp.Dict[str, tp.Any]:
+        """
+        Report connection pool usage.
+
+        :return: Dictionary with pool size, checked out connections, overflow and checkout wait times
+        """
+        pool = self.engine.pool
+        metrics = self.pool_metrics
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'checkouts': metrics.checkouts,
+            'timeouts': metrics.timeouts,
+            'wait_total': metrics.wait_total,
+            'wait_avg': metrics.wait_total / metrics.checkouts if metrics.checkouts else 0.0,
+            'wait_max': metrics.wait_max,
+        }
+
+    def get_dm_channels(self) -> tp.Dict[str, str]:
+        """
+        Load all known direct message channels.
+
+        :return: Dictionary of channel IDs keyed by user ID
+        """
+        with self.Session() as session:
+            return dict(session.query(self.DmChannel.user_id, self.DmChannel.channel_id).all())
+
+    def save_dm_channel(self, user_id: str, channel_id: str) -> None:
+        """
+        Store or replace direct message channel of a user.
+
+        :param user_id: Slack user ID
+        :param channel_id: Slack DM channel ID
+        """
+        statement = pg_insert(self.DmChannel.__table__).values(user_id=user_id, channel_id=channel_id)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'channel_id': statement.excluded.channel_id}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def delete_dm_channel(self, user_id: str) -> None:
+        """
+        Forget direct message channel of a user.
+
+        :param user_id: Slack user ID
+        """
+        with self.engine.begin() as conn:
+            conn.execute(self.DmChannel.__table__.delete().where(self.DmChannel.user_id == user_id))
+
+    def save_schedule(self, schedule: tp.Dict) -> None:
+        """
+        Create or replace reminder schedule of an audit.
+
+        :param schedule: Dictionary with audit_schedule columns
+        """
+        table = self.AuditSchedule.__table__
+        statement = pg_insert(table).values(schedule)
+        statement = statement.on_conflict_do_update(
+            index_elements=['audit_id'],
+            set_={key: statement.excluded[key] for key in schedule if key != 'audit_id'}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def update_schedule(self, audit_id: int, **values) -> None:
+        """
+        Update reminder schedule fields of an audit.
+
+        :param audit_id: Audit ID
+        :param values: Column values to set
+        """
+        table = self.AuditSchedule.__table__
+        with self.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.audit_id == audit_id).values(**values))
+
+    def get_active_schedules(self, with_state: bool = False) -> tp.List[tp.Any]:
+        """
+        Retrieve schedules of audits which are still running.
+        With state, everything needed to resume the sessions is loaded by the same query.
+
+        :param with_state: Also load pending users with their timezones and messages sent to users
+        :return: List of audit_schedule rows with audit name, audit_date and started_at, and with state:
+                 pending_users, pending_tz_offsets, answered_users, notified_users, notified_at
+                 and notified_messages arrays
+        """
+        schedule = self.AuditSchedule.__table__
+        audits = self.Audit.__table__
+        columns = [schedule, audits.c.name.label('audit_name'), audits.c.audit_date,
+                   audits.c.created_at.label('started_at')]
+        if with_state:
+            users = self.User.__table__
+            responses = self.AuditResponse.__table__
+            notifications = self.AuditNotification.__table__
+
+            def notified(column):
+                # Arrays of the same order, so they can be zipped
+                return (
+                    select(func.array_agg(aggregate_order_by(column, notifications.c.user_id)))
+                    .where(notifications.c.audit_id == schedule.c.audit_id)
+                    .scalar_subquery()
+                )
+            def pending(column):
+                # Arrays of the same order, so they can be zipped
+                return (
+                    select(func.array_agg(aggregate_order_by(column, users.c.id)))
+                    .where(users.c.is_deleted.is_(False), users.c.is_ignore.is_(False))
+                    # Correlated to the outer audit_schedule row too, not only to users
+                    .where(~exists().where(and_(responses.c.audit_id == schedule.c.audit_id,
+                                                responses.c.user_id == users.c.id)).correlate_except(responses))
+                    .scalar_subquery()
+                )
+            columns += [
+                pending(users.c.id).label('pending_users'),
+                pending(users.c.tz_offset).label('pending_tz_offsets'),
+                select(func.array_agg(responses.c.user_id)).where(responses.c.audit_id == schedule.c.audit_id)
+                .scalar_subquery().label('answered_users'),
+                notified(notifications.c.user_id).label('notified_users'),
+                notified(notifications.c.notified_at).label('notified_at'),
+                notified(notifications.c.messages).label('notified_messages'),
+            ]
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(*columns)
+                .join(audits, audits.c.id == schedule.c.audit_id)
+                .where(schedule.c.is_active.is_(True))
+            ).all()
+
+    def get_schedule(self, audit_id: int) -> tp.Optional[tp.Any]:
+        """
+        Retrieve reminder schedule of an audit.
 
-    def add_row(self, table: str, data: tp.Dict) -> None:
+        :param audit_id: Audit ID
+        :return: audit_schedule row or None
         """
-        Add a row to a specific table.
+        table = self.AuditSchedule.__table__
+        with self.engine.connect() as conn:
+            return conn.execute(select(table).where(table.c.audit_id == audit_id)).first()
 
-        :param table: SQLAlchemy Table object
-        :param data: Dictionary of row data
+    def get_notifications(
+            self,
+            audit_id: int,
+            user_ids: tp.List[str]
+    ) -> tp.Dict[str, tp.Tuple[datetime.datetime, int]]:
         """
-        table = self.check_table_exists(table)
+        Find messages sent to the given users in an audit, by this or another replica.
+
+        :param audit_id: Audit ID
+        :param user_ids: Users to check
+        :return: Time of the last message and number of messages per messaged user
+        """
+        table = self.AuditNotification.__table__
         with self.engine.connect() as conn:
-            inserting = insert(table).values(data)
-            conn.execute(inserting)
-            conn.commit()
+            rows = conn.execute(
+                select(table.c.user_id, table.c.notified_at, table.c.messages).where(
+                    table.c.audit_id == audit_id,
+                    table.c.user_id == any_(literal(user_ids, ARRAY(String))),
+                )
+            ).all()
+        return {user_id: (notified_at, messages) for user_id, notified_at, messages in rows}
 
-    def select_table(self, table: str):
+    def get_answered_users(self, audit_id: int, user_ids: tp.Optional[tp.List[str]] = None) -> tp.Set[str]:
         """
-        Select all rows from a table.
+        Find which users answered an audit, e.g. through another replica.
 
-        :param table: SQLAlchemy Table object
-        :return: Query result
+        :param audit_id: Audit ID
+        :param user_ids: Users to check, all users if not set
+        :return: IDs of users who answered
         """
-        table = self.check_table_exists(table)
-        with self.engine.connect() as connection:
-            table_obj = select(table)
-            return connection.execute(table_obj)
+        table = self.AuditResponse.__table__
+        statement = select(table.c.user_id).where(table.c.audit_id == audit_id)
+        if user_ids is not None:
+            statement = statement.where(table.c.user_id == any_(literal(user_ids, ARRAY(String))))
+        with self.engine.connect() as conn:
+            return set(conn.execute(statement).scalars())
 
-    def check_if_answer_exist(self, data: tp.Dict) -> tp.Any:
-        """Check if answer for same user exist
+    def deactivate_users(self, user_ids: tp.List[str]) -> None:
+        """
+        Mark users Slack reported as deactivated, before the next users sync does.
+
+        :param user_ids: User IDs
+        """
+        if not user_ids:
+            return
+        table = self.User.__table__
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.id == any_(literal(user_ids, ARRAY(String))))
+                .values(is_deleted=True)
+            )
 
-        :para data: Dict with answer data: user, id, answer
-        :return Bool: True or False if answer exist
+    @contextlib.contextmanager
+    def advisory_lock(self, key: int, sub_key: int) -> tp.Iterator[bool]:
         """
-        return self.Session().query(exists().where(self.User.id == data.get('id'))).scalar()
+        Hold a Postgres session advisory lock while the block runs, without waiting for it.
+        Bot replicas use it to split work, the lock is released if the holder dies.
+
+        :param key: First lock key, e.g. audit ID
+        :param sub_key: Second lock key, e.g. shard number
+        :return: Context manager yielding True if the lock was taken
+        """
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            locked = conn.execute(select(func.pg_try_advisory_lock(key, sub_key))).scalar()
+            try:
+                yield locked
+            finally:
+                if locked:
+                    conn.execute(select(func.pg_advisory_unlock(key, sub_key)))
+
+    def save_notifications(
+            self,
+            audit_id: int,
+            notified: tp.List[tp.Tuple[str, datetime.datetime, int]]
+    ) -> None:
+        """
+        Store when users were last messaged in an audit and how many messages they got, in one statement.
+
+        :param audit_id: Audit ID
+        :param notified: List of (user ID, time of the message, number of messages sent to the user)
+        """
+        if not notified:
+            return
+        table = self.AuditNotification.__table__
+        # A statement can not update the same row twice, the last message of a user is kept
+        latest = {user_id: (notified_at, messages) for user_id, notified_at, messages in notified}
+        statement = pg_insert(table).values([
+            {'audit_id': audit_id, 'user_id': user_id, 'notified_at': notified_at, 'messages': messages}
+            for user_id, (notified_at, messages) in latest.items()
+        ])
+        # Replicas flushing the same user keep the latest message
+        statement = statement.on_conflict_do_update(
+            index_elements=['audit_id', 'user_id'],
+            set_={'notified_at': func.greatest(table.c.notified_at, statement.excluded.notified_at),
+                  'messages': func.greatest(table.c.messages, statement.excluded.messages)}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def migrate_legacy_audit(
+            self,
+            table_name: str,
+            name: str,
+            audit_date: datetime.date,
+            drop: bool = False
+    ) -> int:
+        """
+        Copy answers of a per-day audit table into audit_responses.
+
+        :param table_name: Legacy table name, e.g. user_location_18102026
+        :param name: Audit name
+        :param audit_date: Day of the audit
+        :param drop: Drop the legacy table after copying
+        :return: Number of copied answers
+        """
+        legacy = self.check_table_exists(table_name)
+        if legacy is None:
+            return 0
+
+        audit_id = self.create_audit(name, audit_date)
+        responses = self.AuditResponse.__table__
+        statement = pg_insert(responses).from_select(
+            ['audit_id', 'user_id', 'name', 'answer'],
+            select(literal(audit_id), legacy.c.id, legacy.c.name, legacy.c.answer)
+        ).on_conflict_do_nothing()
+        # Users targeted by the legacy audit are not known
+        response_count, _ = self._audit_counts(self.Audit.id)
+        history = self.AuditAnswerHistory.__table__
+        with self.engine.begin() as conn:
+            copied = conn.execute(statement).rowcount
+            conn.execute(pg_insert(history).from_select(
+                ['audit_id', 'user_id', 'answered_at', 'answer'],
+                select(responses.c.audit_id, responses.c.user_id, responses.c.answered_at, responses.c.answer)
+                .where(responses.c.audit_id == audit_id)
+            ).on_conflict_do_nothing())
+            conn.execute(update(self.Audit.__table__)
+                         .where(self.Audit.id == audit_id)
+                         .values(closed_at=func.coalesce(self.Audit.closed_at, func.now()),
+                                 updated_at=func.now(), response_count=response_count))
+            if drop:
+                legacy.drop(conn)
+        if drop:
+            self.invalidate_table_cache(table_name)
+        return copied
 
 
 def database_init() -> DataBaseManager:
@@ -282,6 +1109,8 @@ def database_init() -> DataBaseManager:
     """
     config = DatabaseConfig.validate_environment()
     database_url = DatabaseConfig.get_database_url(config)
-    return DataBaseManager(database_url)
+    database_manager = DataBaseManager(database_url, DatabaseConfig.get_pool_options())
+    database_manager.create_table()
+    return database_manager
 
 
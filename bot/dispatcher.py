@@ -0,0 +1,324 @@
+import time
+import asyncio
+import threading
+import typing as tp
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_sdk.errors import SlackApiError
+
+from metrics import SLACK_SECONDS, SLACK_CALLS
+
+
+class RateLimiter:
+    """
+    Pace Slack Web API calls per method and honour Retry-After pauses.
+    """
+
+    def __init__(self, rate_limits: tp.Dict[str, float]):
+        """
+        Initialize rate limiter.
+
+        :param rate_limits: Allowed calls per minute keyed by client method name
+        """
+        self._intervals = {method: 60.0 / limit for method, limit in rate_limits.items() if limit}
+        self._next_slot: tp.Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, method: str) -> None:
+        """
+        Block until the next call of the method is allowed.
+
+        :param method: Client method name
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(method, now))
+            self._next_slot[method] = slot + self._intervals.get(method, 0.0)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, method: str, seconds: float) -> None:
+        """
+        Hold back all calls of the method, e.g. after a 429 response.
+
+        :param method: Client method name
+        :param seconds: Pause length in seconds
+        """
+        with self._lock:
+            resume_at = time.monotonic() + seconds
+            self._next_slot[method] = max(self._next_slot.get(method, resume_at), resume_at)
+
+
+class DispatchReport:
+    """
+    Result of one fan-out round.
+    """
+
+    def __init__(self, sent: int, failed: int, elapsed: float, skipped: int = 0):
+        self.sent = sent
+        self.failed = failed
+        self.skipped = skipped
+        self.elapsed = elapsed
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Messages handled per second."""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (f"sent={self.sent} failed={self.failed} skipped={self.skipped} "
+                f"elapsed={self.elapsed:.2f}s throughput={self.throughput:.1f} msg/s")
+
+
+class MessageDispatcher:
+    """
+    Send messages to many users concurrently within Slack rate limits.
+    """
+    # Slack tier limits, calls per minute. Short bursts above them are answered with 429 and Retry-After.
+    DEFAULT_RATE_LIMITS = {
+        'conversations_open': 100,
+        'chat_postMessage': 600,
+        'chat_update': 50,
+        'users_list': 20,
+    }
+    DEFAULT_MAX_WORKERS = 16
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_RETRY_AFTER = 1
+
+    def __init__(
+            self,
+            client: tp.Any = None,
+            max_workers: int = DEFAULT_MAX_WORKERS,
+            rate_limits: tp.Optional[tp.Dict[str, float]] = None,
+            max_retries: int = DEFAULT_MAX_RETRIES
+    ):
+        """
+        Initialize message dispatcher.
+
+        :param client: Slack Web API client used by call()
+        :param max_workers: Size of the sending worker pool
+        :param rate_limits: Calls per minute keyed by client method name
+        :param max_retries: How many times a rate limited call is retried
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(self.DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits)
+
+    def call(self, method: str, **kwargs) -> tp.Any:
+        """
+        Call a Slack Web API method, waiting for its rate limit and retrying on 429.
+
+        :param method: Client method name, e.g. 'chat_postMessage'
+        :param kwargs: Method arguments
+        :return: Slack response
+        :raises SlackApiError: If the call fails or retries are exhausted
+        """
+        attempt = 0
+        with SLACK_SECONDS.time(method=method):
+            while True:
+                self.limiter.acquire(method)
+                try:
+                    response = getattr(self.client, method)(**kwargs)
+                    SLACK_CALLS.inc(method=method, status='ok')
+                    return response
+                except SlackApiError as e:
+                    SLACK_CALLS.inc(method=method, status=e.response.get('error') or e.response.status_code)
+                    if e.response.status_code != 429 or attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    retry_after = float(e.response.headers.get('Retry-After', self.DEFAULT_RETRY_AFTER))
+                    self.limiter.pause(method, retry_after)
+
+    def dispatch(
+            self,
+            user_ids: tp.Iterable[str],
+            message: str,
+            send_message: tp.Callable[[str, str], bool],
+            cancelled: tp.Optional[tp.Callable[[], bool]] = None
+    ) -> DispatchReport:
+        """
+        Send a message to every user through the worker pool.
+
+        :param user_ids: Users to message
+        :param message: Message text
+        :param send_message: Function sending one message, returns False on failure
+        :param cancelled: Function telling that the round was stopped, remaining users are skipped
+        :return: Round report
+        """
+        def send(user_id: str) -> tp.Optional[bool]:
+            if cancelled is not None and cancelled():
+                return None
+            try:
+                return send_message(user_id, message) is not False
+            except Exception as e:
+                print(f"Error sending message to {user_id}: {e}")
+                return False
+
+        started = time.monotonic()
+        sent = failed = skipped = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for is_sent in pool.map(send, user_ids):
+                if is_sent is None:
+                    skipped += 1
+                elif is_sent:
+                    sent += 1
+                else:
+                    failed += 1
+        return DispatchReport(sent, failed, time.monotonic() - started, skipped)
+
+
+class AsyncRateLimiter(RateLimiter):
+    """
+    Rate limiter for coroutines running on one event loop.
+    """
+
+    async def acquire(self, method: str) -> None:
+        """
+        Wait until the next call of the method is allowed.
+
+        :param method: Client method name
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(method, now))
+            self._next_slot[method] = slot + self._intervals.get(method, 0.0)
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncMessageDispatcher:
+    """
+    Send messages to many users from one event loop within Slack rate limits.
+    """
+    DEFAULT_MAX_CONCURRENCY = 100
+
+    def __init__(
+            self,
+            client: tp.Any = None,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            rate_limits: tp.Optional[tp.Dict[str, float]] = None,
+            max_retries: int = MessageDispatcher.DEFAULT_MAX_RETRIES
+    ):
+        """
+        Initialize async message dispatcher.
+
+        :param client: Async Slack Web API client used by call()
+        :param max_concurrency: Number of messages in flight at the same time
+        :param rate_limits: Calls per minute keyed by client method name
+        :param max_retries: How many times a rate limited call is retried
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiter = AsyncRateLimiter(
+            MessageDispatcher.DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        )
+
+    async def call(self, method: str, **kwargs) -> tp.Any:
+        """
+        Call a Slack Web API method, waiting for its rate limit and retrying on 429.
+
+        :param method: Client method name, e.g. 'chat_postMessage'
+        :param kwargs: Method arguments
+        :return: Slack response
+        :raises SlackApiError: If the call fails or retries are exhausted
+        """
+        attempt = 0
+        with SLACK_SECONDS.time(method=method):
+            while True:
+                await self.limiter.acquire(method)
+                try:
+                    response = await getattr(self.client, method)(**kwargs)
+                    SLACK_CALLS.inc(method=method, status='ok')
+                    return response
+                except SlackApiError as e:
+                    SLACK_CALLS.inc(method=method, status=e.response.get('error') or e.response.status_code)
+                    if e.response.status_code != 429 or attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    retry_after = float(e.response.headers.get('Retry-After', MessageDispatcher.DEFAULT_RETRY_AFTER))
+                    self.limiter.pause(method, retry_after)
+
+    async def dispatch(
+            self,
+            user_ids: tp.Iterable[str],
+            message: str,
+            send_message: tp.Callable[[str, str], tp.Awaitable[bool]],
+            cancelled: tp.Optional[tp.Callable[[], bool]] = None
+    ) -> DispatchReport:
+        """
+        Send a message to every user, at most max_concurrency at a time.
+
+        :param user_ids: Users to message
+        :param message: Message text
+        :param send_message: Coroutine function sending one message, returns False on failure
+        :param cancelled: Function telling that the round was stopped, remaining users are skipped
+        :return: Round report
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def send(user_id: str) -> tp.Optional[bool]:
+            async with semaphore:
+                if cancelled is not None and cancelled():
+                    return None
+                try:
+                    return await send_message(user_id, message) is not False
+                except Exception as e:
+                    print(f"Error sending message to {user_id}: {e}")
+                    return False
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(send(user_id) for user_id in user_ids))
+        return DispatchReport(
+            sent=sum(1 for is_sent in results if is_sent),
+            failed=sum(1 for is_sent in results if is_sent is False),
+            elapsed=time.monotonic() - started,
+            skipped=sum(1 for is_sent in results if is_sent is None)
+        )
+
+
+class EventLoopDispatcher:
+    """
+    Blocking front of AsyncMessageDispatcher for code running in worker threads,
+    such as reminder rounds. Calls are executed on the bot event loop.
+    """
+
+    def __init__(self, dispatcher: AsyncMessageDispatcher):
+        """
+        Initialize event loop dispatcher.
+
+        :param dispatcher: Async dispatcher doing the work
+        """
+        self.dispatcher = dispatcher
+        self.loop: tp.Optional[asyncio.AbstractEventLoop] = None
+
+    def _run(self, coroutine: tp.Awaitable) -> tp.Any:
+        if self.loop is None:
+            coroutine.close()
+            raise RuntimeError("Event loop of the dispatcher is not set")
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def call(self, method: str, **kwargs) -> tp.Any:
+        """
+        Call a Slack Web API method on the event loop and wait for the result.
+        """
+        return self._run(self.dispatcher.call(method, **kwargs))
+
+    def dispatch(
+            self,
+            user_ids: tp.Iterable[str],
+            message: str,
+            send_message: tp.Callable[[str, str], tp.Awaitable[bool]],
+            cancelled: tp.Optional[tp.Callable[[], bool]] = None
+    ) -> DispatchReport:
+        """
+        Run a fan-out round on the event loop and wait for its report.
+        """
+        return self._run(self.dispatcher.dispatch(list(user_ids), message, send_message, cancelled))
@@ -0,0 +1,227 @@
+import time
+import datetime
+import threading
+import typing as tp
+
+from db import DataBaseManager
+from answer_log import AnswerLog
+
+
+class AnswerQueue:
+    """
+    Buffer audit answers in memory and write them in batches.
+
+    Answers are flushed when the buffer reaches batch_size or flush_interval
+    seconds after the first buffered answer. A later answer of the same user
+    replaces the buffered one, and rows are upserted per (audit, user), while
+    every buffered answer is written to the answer history.
+
+    With an answer log, every answer is on local disk before put returns, and the
+    flush thread replays it to the database until a write succeeds, so answers
+    are kept during database outages and across restarts.
+    """
+    DEFAULT_BATCH_SIZE = 500
+    DEFAULT_FLUSH_INTERVAL = 0.5
+    RETRY_DELAY = 5
+
+    def __init__(
+            self,
+            database_manager: DataBaseManager,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            answer_log: tp.Optional[AnswerLog] = None
+    ):
+        """
+        Initialize answer queue.
+
+        :param database_manager: Database manager
+        :param batch_size: Number of answers which triggers a flush
+        :param flush_interval: Longest time in seconds an answer waits in the buffer
+        :param answer_log: Local log answers are written to before they are buffered
+        """
+        self._database_manager = database_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.answer_log = answer_log
+
+        self._buffer: tp.Dict[tp.Tuple[int, str], tp.Dict] = {}
+        # Every buffered answer as (answer log sequence number or None, row), released once written
+        self._history: tp.List[tp.Tuple[tp.Optional[int], tp.Dict]] = []
+        self._first_buffered: tp.Optional[float] = None
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: tp.Optional[threading.Thread] = None
+        self._running = False
+
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    def start(self) -> None:
+        """
+        Start the background flush thread, answers left in the answer log are replayed by it.
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        if self.answer_log is not None:
+            self._restore(self.answer_log.recover())
+        self._thread = threading.Thread(target=self._run, name='answer-queue', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop the flush thread and write everything still buffered.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            kept = " and kept in the answer log" if self.answer_log is not None else ""
+            print(f"Answer queue closed with {self.depth} answers not written{kept}: {e}")
+        if self.answer_log is not None:
+            self.answer_log.close()
+
+    def put(self, audit_id: int, data: tp.Dict) -> None:
+        """
+        Buffer an answer.
+
+        :param audit_id: Audit ID
+        :param data: Dictionary with id, name and answer of the user
+        """
+        row = {
+            'audit_id': audit_id,
+            'user_id': data['id'],
+            'name': data['name'],
+            'answer': data['answer'],
+            'answered_at': datetime.datetime.now(datetime.timezone.utc),
+        }
+        seq = None
+        if self.answer_log is not None:
+            try:
+                seq = self.answer_log.append(row)
+            except OSError as e:
+                print(f"Answer of {data['id']} is only kept in memory, the answer log failed: {e}")
+        key = (audit_id, data['id'])
+        with self._condition:
+            if not self._buffer:
+                self._first_buffered = time.monotonic()
+                self._condition.notify_all()
+            self._buffer[key] = row
+            self._history.append((seq, row))
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+
+    def flush(self) -> None:
+        """
+        Write all buffered answers now, e.g. before a report is built.
+
+        :raises SQLAlchemyError: If the write fails, answers stay buffered
+        """
+        with self._write_lock:
+            rows, history = self._take()
+            if rows:
+                self._write(rows, history)
+
+    @property
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._buffer)
+
+    def stats(self) -> tp.Dict[str, tp.Any]:
+        """
+        Report queue depth and flush counters.
+
+        :return: Dictionary of queue metrics
+        """
+        return {
+            'depth': self.depth,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'failures': self.failures,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+            'answer_log': self.answer_log.stats() if self.answer_log is not None else None,
+        }
+
+    def _take(self) -> tp.Tuple[tp.List[tp.Dict], tp.List[tp.Tuple[tp.Optional[int], tp.Dict]]]:
+        with self._condition:
+            rows = list(self._buffer.values())
+            history = self._history
+            self._buffer.clear()
+            self._history = []
+            self._first_buffered = None
+        return rows, history
+
+    def _write(self, rows: tp.List[tp.Dict], history: tp.List[tp.Tuple[tp.Optional[int], tp.Dict]]) -> None:
+        started = time.perf_counter()
+        revisions: tp.Dict[tp.Tuple[int, str], tp.List[tp.Dict]] = {}
+        for _, row in history:
+            revisions.setdefault((row['audit_id'], row['user_id']), []).append(row)
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                self._database_manager.add_responses(batch, [
+                    revision for row in batch for revision in revisions[(row['audit_id'], row['user_id'])]
+                ])
+        except Exception:
+            self.failures += 1
+            # Batches written before the failure are written again, answers are upserted
+            # and revisions already in the history are skipped
+            self._restore(history)
+            raise
+        seqs = [seq for seq, _ in history if seq is not None]
+        if seqs:
+            self.answer_log.release(seqs)
+        self.last_flush_latency = time.perf_counter() - started
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+        self.flushed += len(rows)
+        self.batches += 1
+
+    def _restore(self, history: tp.List[tp.Tuple[tp.Optional[int], tp.Dict]]) -> None:
+        """
+        Put answers back after a failed write, or recovered from the answer log, without replacing newer answers.
+
+        :param history: List of (answer log sequence number or None, row), oldest first
+        """
+        with self._condition:
+            for seq, row in history:
+                key = (row['audit_id'], row['user_id'])
+                buffered = self._buffer.get(key)
+                if buffered is None or buffered['answered_at'] < row['answered_at']:
+                    self._buffer[key] = row
+            # Restored answers are older than the ones buffered since, the history stays in order
+            self._history[:0] = history
+            if self._buffer and self._first_buffered is None:
+                self._first_buffered = time.monotonic()
+                self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._running:
+                    if len(self._buffer) >= self.batch_size:
+                        break
+                    if self._first_buffered is None:
+                        self._condition.wait()
+                        continue
+                    delay = self._first_buffered + self.flush_interval - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if not self._running:
+                    return
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Answer flush failed, retry in {self.RETRY_DELAY}s: {e}")
+                time.sleep(self.RETRY_DELAY)
@@ -1,6 +1,26 @@
-from slack_bot import AuditBot
+import time
+started_at = time.perf_counter()
+
+import os
+import argparse
+
+RUNTIMES = ('sync', 'async')
 
 
 if __name__ == "__main__":
-    bot = AuditBot(debug=False)
+    parser = argparse.ArgumentParser(description="Slack audit bot")
+    # An empty BOT_RUNTIME, as passed by docker compose when it is not set, means the default
+    parser.add_argument('--runtime', choices=RUNTIMES, default=os.environ.get('BOT_RUNTIME', '').strip() or 'sync',
+                        help='Threaded Bolt app or asyncio Bolt app, BOT_RUNTIME variable by default')
+    args = parser.parse_args()
+    # Defaults are not checked against choices
+    if args.runtime not in RUNTIMES:
+        parser.error(f"BOT_RUNTIME must be one of {', '.join(RUNTIMES)}, got '{args.runtime}'")
+
+    if args.runtime == 'async':
+        from async_slack_bot import AsyncAuditBot as Bot
+    else:
+        from slack_bot import AuditBot as Bot
+
+    bot = Bot(debug=False, started_at=started_at)
     bot.start()
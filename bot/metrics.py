@@ -0,0 +1,560 @@
+"""
+In-process metrics: counters, histograms and gauges rendered in the Prometheus text format,
+a local HTTP endpoint serving them, periodic JSON log snapshots and on-demand profiling
+of reminder rounds.
+"""
+import io
+import os
+import sys
+import json
+import time
+import datetime
+import functools
+import threading
+import contextlib
+import collections
+import typing as tp
+import asyncio
+import inspect
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _format_labels(labels: tp.Dict[str, tp.Any]) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tp.Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: tp.Dict[tp.Tuple, float] = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self) -> tp.Iterator[tp.Tuple[str, tp.Dict[str, tp.Any], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labels, key)), value
+
+    def snapshot(self) -> tp.Dict[str, float]:
+        return {_format_labels(labels) or 'value': value for _, labels, value in self.samples()}
+
+
+class Histogram:
+    """
+    Histogram of durations in seconds with optional labels.
+    """
+    kind = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labels: tp.Sequence[str] = (),
+            buckets: tp.Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (the last one is +Inf), sum and max
+        self._values: tp.Dict[tp.Tuple, tp.List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            counts, total, maximum = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = [counts, total + value, max(maximum, value)]
+
+    @contextlib.contextmanager
+    def time(self, **labels) -> tp.Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> tp.Iterator[tp.Tuple[str, tp.Dict[str, tp.Any], float]]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total, _) in self._values.items()]
+        for key, counts, total in values:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket', {**labels, 'le': le}, cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+    def snapshot(self) -> tp.Dict[str, tp.Dict[str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        result = {}
+        for key, (counts, total, maximum) in values:
+            count = sum(counts)
+            result[_format_labels(dict(zip(self.labels, key))) or 'value'] = {
+                'count': count,
+                'avg': total / count if count else 0.0,
+                'max': maximum,
+            }
+        return result
+
+
+class Gauge:
+    """
+    Value read from a function when metrics are collected, e.g. queue depth.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, func: tp.Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def samples(self) -> tp.Iterator[tp.Tuple[str, tp.Dict[str, tp.Any], float]]:
+        yield self.name, {}, self.func()
+
+    def snapshot(self) -> float:
+        return self.func()
+
+
+class MetricsRegistry:
+    """
+    Named metrics of the process.
+    """
+
+    def __init__(self):
+        self._metrics: tp.Dict[str, tp.Union[Counter, Histogram, Gauge]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labels: tp.Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tp.Sequence[str] = (), **kwargs) -> Histogram:
+        return self._register(name, lambda: Histogram(name, documentation, labels, **kwargs))
+
+    def gauge(self, name: str, documentation: str, func: tp.Callable[[], float]) -> Gauge:
+        """
+        Register a gauge, replacing a gauge of the same name.
+        """
+        gauge = Gauge(name, documentation, func)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def _register(self, name: str, factory: tp.Callable[[], tp.Any]) -> tp.Any:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        :return: Metrics text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            except Exception as e:
+                lines.append(f'# {metric.name} failed: {e}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> tp.Dict[str, tp.Any]:
+        """
+        Current metric values, for JSON logs.
+
+        :return: Dictionary keyed by metric name
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            try:
+                result[metric.name] = metric.snapshot()
+            except Exception as e:
+                result[metric.name] = f'failed: {e}'
+        return result
+
+
+REGISTRY = MetricsRegistry()
+
+COMMAND_SECONDS = REGISTRY.histogram('bot_command_seconds', 'Duration of Bolt command handlers', ('command',))
+COMMAND_ERRORS = REGISTRY.counter('bot_command_errors_total', 'Command handlers which raised', ('command',))
+DB_SECONDS = REGISTRY.histogram('bot_db_seconds', 'Duration of database manager methods', ('method',))
+DB_ERRORS = REGISTRY.counter('bot_db_errors_total', 'Database manager methods which raised', ('method',))
+DB_TABLE_CACHE = REGISTRY.counter('bot_db_table_cache_total', 'Reflected table cache lookups by result', ('result',))
+SLACK_SECONDS = REGISTRY.histogram('bot_slack_api_seconds', 'Duration of Slack Web API calls, retries included',
+                                   ('method',))
+SLACK_CALLS = REGISTRY.counter('bot_slack_api_calls_total', 'Slack Web API calls by method and status',
+                               ('method', 'status'))
+ROUND_SECONDS = REGISTRY.histogram('bot_reminder_round_seconds', 'Duration of reminder rounds', ('audit',))
+ROUND_MESSAGES = REGISTRY.counter('bot_reminder_messages_total', 'Reminder messages by result', ('audit', 'result'))
+STARTUP_SECONDS = REGISTRY.histogram('bot_startup_seconds', 'Duration of startup phases', ('phase',))
+
+
+def log_json(event: str, **fields) -> None:
+    """
+    Print one structured log line.
+
+    :param event: Event name
+    :param fields: Event fields
+    """
+    record = {'time': datetime.datetime.now(datetime.timezone.utc).isoformat(), 'event': event, **fields}
+    print(json.dumps(record, default=str), flush=True)
+
+
+def timed_handler(command: str, handler: tp.Callable) -> tp.Callable:
+    """
+    Wrap a Bolt listener (ack, body, say) to record its duration and errors.
+
+    :param command: Command name used as label
+    :param handler: Blocking or coroutine listener
+    :return: Listener of the same kind
+    """
+    if asyncio.iscoroutinefunction(handler):
+        async def async_wrapper(ack, body, say):
+            started = time.perf_counter()
+            try:
+                return await handler(ack, body, say)
+            except Exception:
+                COMMAND_ERRORS.inc(command=command)
+                raise
+            finally:
+                COMMAND_SECONDS.observe(time.perf_counter() - started, command=command)
+        return async_wrapper
+
+    def wrapper(ack, body, say):
+        started = time.perf_counter()
+        try:
+            return handler(ack, body, say)
+        except Exception:
+            COMMAND_ERRORS.inc(command=command)
+            raise
+        finally:
+            COMMAND_SECONDS.observe(time.perf_counter() - started, command=command)
+    return wrapper
+
+
+def instrument_methods(histogram: Histogram, errors: Counter) -> tp.Callable[[type], type]:
+    """
+    Class decorator recording duration and errors of every public method.
+    Generators are timed until they are exhausted or closed.
+
+    :param histogram: Histogram with a 'method' label
+    :param errors: Counter with a 'method' label
+    :return: Class decorator
+    """
+    def wrap(func: tp.Callable) -> tp.Callable:
+        name = func.__name__
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    yield from func(*args, **kwargs)
+                except Exception:
+                    errors.inc(method=name)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, method=name)
+            return generator_wrapper
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    errors.inc(method=name)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, method=name)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.inc(method=name)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, method=name)
+        return wrapper
+
+    def decorate(cls: type) -> type:
+        for name, attr in list(vars(cls).items()):
+            if not name.startswith('_') and inspect.isfunction(attr):
+                setattr(cls, name, wrap(attr))
+        return cls
+    return decorate
+
+
+class Profiler:
+    """
+    Profile the next reminder round when armed at runtime.
+
+    'cprofile' profiles the thread running the round with cProfile.
+    'sample' samples stacks of all threads, so the message fan-out workers are included,
+    and reports them in the collapsed format used by flame graph tools.
+    """
+    MODES = ('cprofile', 'sample')
+    SAMPLE_INTERVAL = 0.005
+    TOP_FUNCTIONS = 40
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._armed: tp.Optional[str] = None
+        self.last_report: tp.Optional[str] = None
+
+    def arm(self, mode: str) -> None:
+        """
+        Profile the next profiled block.
+
+        :param mode: One of MODES
+        :raises ValueError: If the mode is unknown
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', use one of: {', '.join(self.MODES)}")
+        with self._lock:
+            self._armed = mode
+
+    @property
+    def armed(self) -> tp.Optional[str]:
+        return self._armed
+
+    @contextlib.contextmanager
+    def profile(self, name: str) -> tp.Iterator[None]:
+        """
+        Run the block under the armed profiler, or as is if not armed.
+
+        :param name: Name of the profiled block, for logs
+        """
+        with self._lock:
+            mode, self._armed = self._armed, None
+        if mode is None:
+            yield
+            return
+
+        started = time.perf_counter()
+        if mode == 'cprofile':
+            # Imported on demand, profiling is rare and not needed at startup
+            import pstats
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(self.TOP_FUNCTIONS)
+                self.last_report = stream.getvalue()
+        else:
+            stacks: tp.Dict[str, int] = collections.Counter()
+            stop = threading.Event()
+            sampler = threading.Thread(target=self._sample, args=(stacks, stop), name='profile-sampler', daemon=True)
+            sampler.start()
+            try:
+                yield
+            finally:
+                stop.set()
+                sampler.join()
+                self.last_report = '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common())
+        log_json('profile', name=name, mode=mode, elapsed=time.perf_counter() - started)
+
+    def _sample(self, stacks: tp.Dict[str, int], stop: threading.Event) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not stop.wait(self.SAMPLE_INTERVAL):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}')
+                    frame = frame.f_back
+                stacks[';'.join([names.get(thread_id, str(thread_id))] + frames[::-1])] += 1
+
+
+PROFILER = Profiler()
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint.
+
+    GET /metrics         metrics in the Prometheus text format
+    POST /profile?mode=  profile the next reminder round, mode is cprofile or sample
+    GET /profile         report of the last profile
+    """
+    DEFAULT_HOST = '127.0.0.1'
+    DEFAULT_PORT = 9108
+
+    def __init__(
+            self,
+            host: str = DEFAULT_HOST,
+            port: int = DEFAULT_PORT,
+            registry: MetricsRegistry = REGISTRY,
+            profiler: Profiler = PROFILER
+    ):
+        """
+        Initialize metrics server.
+
+        :param host: Address to listen on
+        :param port: Port to listen on
+        :param registry: Metrics to serve
+        :param profiler: Profiler armed by POST /profile
+        """
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.profiler = profiler
+        self._server: tp.Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def from_environment(cls) -> tp.Optional['MetricsServer']:
+        """
+        Configure from METRICS_HOST and METRICS_PORT, port 0 disables the endpoint.
+
+        :return: Metrics server or None if disabled
+        """
+        port = int(os.environ.get('METRICS_PORT') or cls.DEFAULT_PORT)
+        if port == 0:
+            return None
+        return cls(os.environ.get('METRICS_HOST') or cls.DEFAULT_HOST, port)
+
+    def start(self) -> None:
+        """
+        Serve in a background thread.
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/metrics':
+                    self._reply(200, server.registry.render(), 'text/plain; version=0.0.4')
+                elif path == '/profile':
+                    self._reply(200, server.profiler.last_report or 'No profile yet\n')
+                else:
+                    self._reply(404, 'Not found\n')
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != '/profile':
+                    self._reply(404, 'Not found\n')
+                    return
+                mode = parse_qs(url.query).get('mode', ['cprofile'])[0]
+                try:
+                    server.profiler.arm(mode)
+                except ValueError as e:
+                    self._reply(400, f'{e}\n')
+                    return
+                self._reply(202, f'Next reminder round is profiled with {mode}\n')
+
+            def _reply(self, status: int, text: str, content_type: str = 'text/plain') -> None:
+                body = text.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are frequent, do not print a line for each
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        print(f"Metrics served at http://{self.host}:{self._server.server_port}/metrics")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class MetricsLogger:
+    """
+    Print a JSON snapshot of all metrics every interval seconds.
+    """
+    DEFAULT_INTERVAL = 60.0
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, registry: MetricsRegistry = REGISTRY):
+        """
+        Initialize metrics logger.
+
+        :param interval: Seconds between snapshots
+        :param registry: Metrics to log
+        """
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: tp.Optional[threading.Thread] = None
+
+    @classmethod
+    def from_environment(cls) -> tp.Optional['MetricsLogger']:
+        """
+        Configure from METRICS_LOG_INTERVAL, 0 disables the snapshots.
+
+        :return: Metrics logger or None if disabled
+        """
+        interval = float(os.environ.get('METRICS_LOG_INTERVAL') or cls.DEFAULT_INTERVAL)
+        return cls(interval) if interval > 0 else None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='metrics-logger', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            log_json('metrics', **self.registry.snapshot())
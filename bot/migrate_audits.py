@@ -0,0 +1,63 @@
+"""
+Fold per-day audit tables ({name}_{DDMMYYYY}) into audits and audit_responses.
+
+Usage: python migrate_audits.py [--drop] [--dry-run]
+"""
+import re
+import argparse
+import datetime
+import typing as tp
+
+from sqlalchemy import inspect
+
+from db import database_init, DataBaseManager
+
+LEGACY_TABLE = re.compile(r'^(?P<name>.+)_(?P<date>\d{8})$')
+LEGACY_COLUMNS = {'id', 'name', 'answer'}
+
+
+def find_legacy_tables(database_manager: DataBaseManager) -> tp.List[tp.Tuple[str, str, datetime.date]]:
+    """
+    Find per-day audit tables.
+
+    :param database_manager: Database manager
+    :return: List of (table name, audit name, audit date)
+    """
+    inspector = inspect(database_manager.engine)
+    tables = []
+    for table_name in inspector.get_table_names():
+        match = LEGACY_TABLE.match(table_name)
+        if not match:
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table_name)}
+        if columns != LEGACY_COLUMNS:
+            continue
+        try:
+            audit_date = datetime.datetime.strptime(match.group('date'), '%d%m%Y').date()
+        except ValueError:
+            continue
+        tables.append((table_name, match.group('name'), audit_date))
+    return sorted(tables, key=lambda table: table[2])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--drop', action='store_true', help='Drop legacy tables after copying')
+    parser.add_argument('--dry-run', action='store_true', help='Only list legacy tables')
+    args = parser.parse_args()
+
+    database_manager = database_init()
+    active = {(schedule.audit_name, schedule.audit_date) for schedule in database_manager.get_active_schedules()}
+    for table_name, name, audit_date in find_legacy_tables(database_manager):
+        if (name, audit_date) in active:
+            print(f"{table_name}: skipped, audit is active")
+            continue
+        if args.dry_run:
+            print(f"{table_name}: audit '{name}' of {audit_date}")
+            continue
+        copied = database_manager.migrate_legacy_audit(table_name, name, audit_date, drop=args.drop)
+        print(f"{table_name}: {copied} answers copied" + (", table dropped" if args.drop else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import os
+import heapq
+import typing as tp
+
+from custom_exceptions import EnvironmentVarException
+
+
+class ReminderPolicy:
+    """
+    Decide when a user gets the next message of an audit.
+
+    The interval between reminders grows by the backoff factor after every reminder,
+    a user gets at most max_messages messages per audit, and a message due in the quiet
+    hours of the user's Slack timezone waits until they end.
+    """
+    DEFAULT_BACKOFF = 2.0
+    # Messages per user and audit, the audit message included
+    DEFAULT_MAX_MESSAGES = 5
+    # Local hours without messages: from the first hour until the second one
+    DEFAULT_QUIET_HOURS = (22, 8)
+    # Slack errors of a direct message to a user deactivated since the last users sync
+    DEACTIVATED_ERRORS = ('user_disabled', 'user_not_found', 'is_archived')
+
+    def __init__(
+            self,
+            backoff: float = DEFAULT_BACKOFF,
+            max_messages: int = DEFAULT_MAX_MESSAGES,
+            quiet_hours: tp.Optional[tp.Tuple[int, int]] = DEFAULT_QUIET_HOURS
+    ):
+        """
+        Initialize policy.
+
+        :param backoff: Factor the reminder interval is multiplied by after every reminder
+        :param max_messages: Messages per user and audit, the audit message included
+        :param quiet_hours: Local start and end hour without messages, None to message at any time
+        """
+        self.backoff = max(1.0, backoff)
+        self.max_messages = max(1, max_messages)
+        self.quiet_hours = quiet_hours
+
+    @classmethod
+    def from_env(cls) -> 'ReminderPolicy':
+        """
+        Read policy settings from REMINDER_BACKOFF, REMINDER_MAX_MESSAGES and REMINDER_QUIET_HOURS,
+        e.g. "22-8", or "off" to message at any time.
+
+        :return: Reminder policy
+        :raises EnvironmentVarException: If a value can not be parsed
+        """
+        backoff = os.environ.get('REMINDER_BACKOFF')
+        max_messages = os.environ.get('REMINDER_MAX_MESSAGES')
+        quiet_hours = os.environ.get('REMINDER_QUIET_HOURS')
+        try:
+            return cls(
+                backoff=float(backoff) if backoff else cls.DEFAULT_BACKOFF,
+                max_messages=int(max_messages) if max_messages else cls.DEFAULT_MAX_MESSAGES,
+                quiet_hours=cls._parse_quiet_hours(quiet_hours) if quiet_hours else cls.DEFAULT_QUIET_HOURS,
+            )
+        except ValueError:
+            raise EnvironmentVarException(
+                'Environment variables "REMINDER_BACKOFF", "REMINDER_MAX_MESSAGES" or "REMINDER_QUIET_HOURS" '
+                'can not be parsed'
+            )
+
+    @staticmethod
+    def _parse_quiet_hours(value: str) -> tp.Optional[tp.Tuple[int, int]]:
+        if value.strip().lower() in ('off', 'none', '0'):
+            return None
+        start, end = (int(hour) % 24 for hour in value.split('-'))
+        return (start, end) if start != end else None
+
+    def next_due(
+            self,
+            messages: int,
+            last_message_at: float,
+            interval: float,
+            tz_offset: tp.Optional[int] = None,
+            now: float = 0.0
+    ) -> tp.Optional[float]:
+        """
+        Time of the next message to a user.
+
+        :param messages: Messages already sent to the user in the audit
+        :param last_message_at: Epoch time of the last message
+        :param interval: Reminder interval of the audit, seconds
+        :param tz_offset: Offset of the user's timezone from UTC, seconds, None if not known
+        :param now: Current epoch time, the audit message is due now
+        :return: Epoch time, None if the user got all messages
+        """
+        if messages >= self.max_messages:
+            return None
+        if messages == 0:
+            due = now
+        else:
+            due = last_message_at + interval * self.backoff ** (messages - 1)
+        return self.after_quiet_hours(due, tz_offset)
+
+    def after_quiet_hours(self, due: float, tz_offset: tp.Optional[int]) -> float:
+        """
+        Move a time falling into the user's quiet hours to their end.
+
+        :param due: Epoch time
+        :param tz_offset: Offset of the user's timezone from UTC, seconds, None if not known
+        :return: Epoch time
+        """
+        if self.quiet_hours is None or tz_offset is None:
+            return due
+        start, end = (hour * 3600 for hour in self.quiet_hours)
+        local = (due + tz_offset) % 86400
+        # Quiet hours may cross midnight, e.g. 22-8
+        quiet = start <= local < end if start < end else local >= start or local < end
+        return due + (end - local) % 86400 if quiet else due
+
+
+class ReminderQueue:
+    """
+    Users ordered by the time of their next message.
+
+    A user pushed again is moved, entries left behind in the heap are skipped when they come up.
+    """
+    def __init__(self):
+        self._heap: tp.List[tp.Tuple[float, str]] = []
+        self._due: tp.Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._due
+
+    def push(self, user_id: str, due: float) -> None:
+        """
+        Queue a user, or move an already queued one.
+
+        :param user_id: User ID
+        :param due: Epoch time of the next message
+        """
+        self._due[user_id] = due
+        heapq.heappush(self._heap, (due, user_id))
+
+    def discard(self, user_id: str) -> None:
+        """
+        Remove a user, e.g. after an answer.
+
+        :param user_id: User ID
+        """
+        if self._due.pop(user_id, None) is not None and len(self._heap) > 2 * len(self._due) + 1024:
+            # Mostly stale entries, e.g. after many answers
+            self._heap = [(due, user_id) for user_id, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now: float) -> tp.List[str]:
+        """
+        Take all users due at the given time.
+
+        :param now: Epoch time
+        :return: User IDs, earliest first
+        """
+        users = []
+        while self._heap and self._heap[0][0] <= now:
+            due, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) == due:
+                del self._due[user_id]
+                users.append(user_id)
+        return users
+
+    def next_due(self) -> tp.Optional[float]:
+        """
+        Time of the earliest queued message.
+
+        :return: Epoch time, None if the queue is empty
+        """
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def clear(self) -> None:
+        self._heap = []
+        self._due = {}
@@ -0,0 +1,134 @@
+import os
+import csv
+import glob
+import threading
+import datetime
+import itertools
+import typing as tp
+
+
+class ReportWriter:
+    """
+    Write audit answers to report files row by row, without loading them all in memory.
+    Writer libraries are imported only when a report of their format is requested.
+    """
+    COLUMNS = ('Name', 'Real name', 'Answer', 'Answered at')
+    FORMATS = ('xlsx', 'csv', 'parquet')
+    PARQUET_BATCH_SIZE = 10000
+
+    @classmethod
+    def write(cls, rows: tp.Iterable[tp.Sequence], path: str, file_format: str = 'xlsx') -> str:
+        """
+        Write rows to a report file.
+
+        :param rows: Rows of (name, real name, answer, answered at)
+        :param path: Path of the report file, without extension
+        :param file_format: One of FORMATS
+        :return: Path to the saved file
+        :raises ValueError: If the format is not supported
+        """
+        if file_format not in cls.FORMATS:
+            raise ValueError(f"Unsupported report format '{file_format}', use one of: {', '.join(cls.FORMATS)}")
+        file_name = f"{path}.{file_format}"
+        getattr(cls, f'_write_{file_format}')(rows, file_name)
+        return file_name
+
+    @staticmethod
+    def _naive_utc(value: tp.Optional[datetime.datetime]) -> tp.Optional[datetime.datetime]:
+        """Excel does not store time zones, so timestamps are written in UTC."""
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    @classmethod
+    def _write_xlsx(cls, rows: tp.Iterable[tp.Sequence], file_name: str) -> None:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(cls.COLUMNS)
+        for name, real_name, answer, answered_at in rows:
+            sheet.append((name, real_name, answer, cls._naive_utc(answered_at)))
+        workbook.save(file_name)
+
+    @classmethod
+    def _write_csv(cls, rows: tp.Iterable[tp.Sequence], file_name: str) -> None:
+        with open(file_name, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(cls.COLUMNS)
+            for name, real_name, answer, answered_at in rows:
+                writer.writerow((name, real_name, answer, answered_at.isoformat() if answered_at else ''))
+
+    @classmethod
+    def _write_parquet(cls, rows: tp.Iterable[tp.Sequence], file_name: str) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ('name', pa.string()),
+            ('real_name', pa.string()),
+            ('answer', pa.string()),
+            ('answered_at', pa.timestamp('us', tz='UTC')),
+        ])
+        rows = iter(rows)
+        with pq.ParquetWriter(file_name, schema) as writer:
+            while True:
+                batch = list(itertools.islice(rows, cls.PARQUET_BATCH_SIZE))
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist(
+                    [dict(zip(schema.names, row)) for row in batch], schema=schema
+                ))
+
+
+class ReportCache:
+    """
+    Report files kept on disk, keyed by audit ID and the time the audit was last modified,
+    so a report of an unchanged audit is written only once.
+    """
+
+    def __init__(self, folder: str):
+        """
+        Initialize report cache.
+
+        :param folder: Folder with cached report files
+        """
+        self.folder = folder
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+            self,
+            audit_id: int,
+            modified_at: datetime.datetime,
+            file_format: str,
+            rows: tp.Callable[[], tp.Iterable[tp.Sequence]]
+    ) -> str:
+        """
+        Return a cached report file, write it if the audit changed since.
+
+        :param audit_id: Audit ID
+        :param modified_at: Time the audit was last modified
+        :param file_format: One of ReportWriter.FORMATS
+        :param rows: Function returning report rows, called on a cache miss only
+        :return: Path to the report file
+        """
+        key = f"{audit_id}_{modified_at.astimezone(datetime.timezone.utc).strftime('%Y%m%d%H%M%S%f')}"
+        path = os.path.join(self.folder, f"{key}.{file_format}")
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        os.makedirs(self.folder, exist_ok=True)
+        # Written under a temporary name, so a concurrent request never sends a partial file
+        partial_path = os.path.join(self.folder, f".{key}_{os.getpid()}_{threading.get_ident()}")
+        partial = ReportWriter.write(rows(), partial_path, file_format)
+        os.replace(partial, path)
+        for stale in glob.glob(os.path.join(self.folder, f"{audit_id}_*.{file_format}")):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+        return path
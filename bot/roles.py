@@ -0,0 +1,161 @@
+import json
+import time
+import select
+import threading
+import typing as tp
+
+from db import DataBaseManager
+
+
+class RoleCache:
+    """
+    Keep admin and ignored user IDs in memory.
+
+    Local changes made by DataBaseManager.update_users are applied in place.
+    Changes made by other bot replicas arrive through Postgres LISTEN/NOTIFY,
+    and the sets are reloaded from the database after ttl seconds in case a
+    notification was missed.
+    """
+    DEFAULT_TTL = 300
+    POLL_INTERVAL = 1.0
+    RETRY_DELAY = 5
+
+    def __init__(self, database_manager: DataBaseManager, ttl: float = DEFAULT_TTL):
+        """
+        Initialize role cache and subscribe it to local role changes.
+
+        :param database_manager: Database manager
+        :param ttl: Seconds after which the sets are reloaded from the database
+        """
+        self._database_manager = database_manager
+        self.ttl = ttl
+
+        self._admins: tp.Set[str] = set()
+        self._ignored: tp.Set[str] = set()
+        self._lock = threading.Lock()
+        self._loaded_at: tp.Optional[float] = None
+        # Bumped on every applied change, so a reload started earlier does not overwrite it
+        self._version = 0
+        self._thread: tp.Optional[threading.Thread] = None
+        self._running = False
+
+        self.reloads = 0
+        self.notifications = 0
+
+        database_manager.role_listeners.append(self.apply)
+
+    def is_admin(self, user_id: str) -> bool:
+        self._ensure_fresh()
+        return user_id in self._admins
+
+    def is_ignored(self, user_id: str) -> bool:
+        self._ensure_fresh()
+        return user_id in self._ignored
+
+    @property
+    def admins(self) -> tp.FrozenSet[str]:
+        self._ensure_fresh()
+        return frozenset(self._admins)
+
+    @property
+    def ignored(self) -> tp.FrozenSet[str]:
+        self._ensure_fresh()
+        return frozenset(self._ignored)
+
+    def reload(self) -> None:
+        """
+        Load admin and ignored users from the database.
+        """
+        version = self._version
+        admins, ignored = self._database_manager.get_roles()
+        with self._lock:
+            self.reloads += 1
+            if version != self._version:
+                # A change arrived while loading, the loaded sets may be older than it
+                return
+            self._admins, self._ignored = admins, ignored
+            self._loaded_at = time.monotonic()
+
+    def apply(self, roles: tp.Iterable[tp.Tuple[str, bool, bool]]) -> None:
+        """
+        Apply changed roles.
+
+        :param roles: Tuples of (user ID, is admin, is ignored)
+        """
+        with self._lock:
+            for user_id, is_admin, is_ignore in roles:
+                self._set(self._admins, user_id, is_admin)
+                self._set(self._ignored, user_id, is_ignore)
+            self._version += 1
+
+    def start(self) -> None:
+        """
+        Start the thread listening for role changes of other replicas.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._listen, name='role-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the listener thread.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _set(users: tp.Set[str], user_id: str, value: bool) -> None:
+        if value:
+            users.add(user_id)
+        else:
+            users.discard(user_id)
+
+    def _ensure_fresh(self) -> None:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        try:
+            self.reload()
+        except Exception as e:
+            # Stale roles are better than failing the command
+            print(f"Roles reload failed: {e}")
+
+    def _on_notify(self, payload: str) -> None:
+        try:
+            role = json.loads(payload)
+            self.apply([(role['id'], role['is_admin'], role['is_ignore'])])
+            self.notifications += 1
+        except (ValueError, KeyError) as e:
+            print(f"Bad role notification '{payload}': {e}")
+
+    def _listen(self) -> None:
+        while self._running:
+            connection = None
+            try:
+                # Own connection, not returned to the pool while listening
+                connection = self._database_manager.engine.raw_connection()
+                driver_connection = connection.driver_connection
+                connection.detach()
+                if not hasattr(driver_connection, 'poll'):
+                    print("Role notifications need the psycopg2 driver, roles are refreshed by TTL only")
+                    return
+                driver_connection.autocommit = True
+                with driver_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {DataBaseManager.ROLES_CHANNEL}')
+                # Changes made while not listening are lost, load the current state
+                self.reload()
+                while self._running:
+                    if not select.select([driver_connection], [], [], self.POLL_INTERVAL)[0]:
+                        continue
+                    driver_connection.poll()
+                    while driver_connection.notifies:
+                        self._on_notify(driver_connection.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Role listener failed, retry in {self.RETRY_DELAY}s: {e}")
+                time.sleep(self.RETRY_DELAY)
+            finally:
+                if connection is not None:
+                    connection.close()
@@ -0,0 +1,129 @@
+import time
+import heapq
+import threading
+import typing as tp
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ReminderScheduler:
+    """
+    Run audit reminder rounds in the background, ordered by due time.
+
+    A job is a callable that runs one round and returns the epoch time of its
+    next round, or None when the job is finished.
+    """
+    DEFAULT_MAX_WORKERS = 4
+    RETRY_DELAY = 60
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Initialize scheduler.
+
+        :param max_workers: How many rounds of different jobs may run at the same time
+        """
+        self._heap: tp.List[tp.Tuple[float, int, str]] = []
+        self._jobs: tp.Dict[str, tp.Callable[[], tp.Optional[float]]] = {}
+        self._due: tp.Dict[str, float] = {}
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reminder')
+        self._thread: tp.Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self) -> None:
+        """
+        Start the scheduler thread.
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the scheduler thread and wait for running rounds.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._workers.shutdown(wait=True)
+
+    def schedule(self, job_id: str, job: tp.Callable[[], tp.Optional[float]], due_at: float) -> None:
+        """
+        Add a job or move it to a new due time.
+
+        :param job_id: Unique job identifier, e.g. audit table name
+        :param job: Callable running one round
+        :param due_at: Epoch time of the next round
+        """
+        with self._condition:
+            self._jobs[job_id] = job
+            self._push(job_id, due_at)
+
+    def cancel(self, job_id: str) -> None:
+        """
+        Remove a job. A round that is already running finishes, but no new round starts.
+
+        :param job_id: Job identifier
+        """
+        with self._condition:
+            self._jobs.pop(job_id, None)
+            self._due.pop(job_id, None)
+            self._condition.notify_all()
+
+    def is_scheduled(self, job_id: str) -> bool:
+        """
+        Check if a job is known to the scheduler.
+
+        :param job_id: Job identifier
+        :return: True if the job is scheduled or running
+        """
+        with self._condition:
+            return job_id in self._jobs
+
+    def _push(self, job_id: str, due_at: float) -> None:
+        self._counter += 1
+        self._due[job_id] = due_at
+        heapq.heappush(self._heap, (due_at, self._counter, job_id))
+        self._condition.notify_all()
+
+    def _run(self) -> None:
+        with self._condition:
+            while self._running:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                due_at, _, job_id = self._heap[0]
+                if self._due.get(job_id) != due_at:
+                    # Cancelled or rescheduled entry
+                    heapq.heappop(self._heap)
+                    continue
+
+                delay = due_at - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                del self._due[job_id]
+                self._workers.submit(self._run_job, job_id, self._jobs[job_id])
+
+    def _run_job(self, job_id: str, job: tp.Callable[[], tp.Optional[float]]) -> None:
+        try:
+            next_run = job()
+        except Exception as e:
+            print(f"Reminder job '{job_id}' failed, retry in {self.RETRY_DELAY}s: {e}")
+            next_run = time.time() + self.RETRY_DELAY
+
+        with self._condition:
+            if self._jobs.get(job_id) is not job:
+                return
+            if next_run is None:
+                del self._jobs[job_id]
+            elif job_id not in self._due:
+                self._push(job_id, next_run)
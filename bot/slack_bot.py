@@ -1,49 +1,155 @@
 from slack_bolt import App
 from db import database_init
 from audit import AuditSession
+from reminders import ReminderPolicy
+from dispatcher import MessageDispatcher
+from scheduler import ReminderScheduler
+from user_sync import UserSync
+from report import ReportWriter, ReportCache
+from ingest import AnswerQueue
+from answer_log import AnswerLog
+from roles import RoleCache
+from user_list import UserListPage
+from metrics import REGISTRY, STARTUP_SECONDS, MetricsServer, MetricsLogger, timed_handler, log_json
 from slack_sdk.errors import SlackApiError
+from sqlalchemy.exc import SQLAlchemyError
 from custom_exceptions import EnvironmentVarException
-from slack_bolt.adapter.socket_mode import SocketModeHandler
 import os
+import re
+import json
+import sys
+import atexit
+import threading
+import time
+import signal
 import typing as tp
 
 class AuditBot:
 
     _token_vars = ('SLACK_BOT_TOKEN', 'SLACK_APP_TOKEN')
+    _MENTION = re.compile(r'<@(?P<id>[UW][A-Z0-9]+)(?:\|(?P<name>[^>]*))?>')
+    # Seconds between checks for audits opened, changed or closed by another replica
+    SESSION_SYNC_INTERVAL = 15
+    # Passed to Bolt, otherwise it inspects the call stack to name the app
+    APP_NAME = 'slack_audit_bot'
+    AUDITS_PAGE_SIZE = 20
+    # Prefixes of audit IDs in /audit_get and /audits_show. In /audit_get a number is an audit ID as well,
+    # other words are audit names
+    AUDIT_ID_PREFIX = 'id:'
+    BEFORE_ID_PREFIX = 'before:'
+    AUDITS_SHOW_USAGE = "Usage: /audits_show [audit name] [before:<audit id>]"
+    AUDIT_GET_USAGE = ("Usage: /audit_get <audit id> [xlsx|csv|parquet], or /audit_get <audit name> [format] "
+                       "for the latest audit of a name. IDs are listed by /audits_show")
+    USER_LISTS = {
+        "/ignore_show": "Ignored users:",
+        "/admin_show": "Admin users:",
+        "/audit_unanswered": "Audit unanswered:",
+    }
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, started_at: tp.Optional[float] = None):
+        """
+        :param debug: Debug mode
+        :param started_at: time.perf_counter() at process start, startup phases are measured from it
+        """
+        init_started = time.perf_counter()
+        self.started_at = started_at or init_started
+        self.startup: tp.Dict[str, float] = {}
+        self.record_startup('import', self.started_at, init_started)
         self.database_manager = database_init()
         self.__check_tokens()
         self.debug = debug
-        self.app = App(token=self.SLACK_BOT_TOKEN)
+        self.app = self._create_app()
+        # Blocking Web API client, used by handlers and background workers
+        self.client = self._create_client()
+        self.dispatcher = self._create_dispatcher()
+        # Loaded by the warm-up job after connecting, channels opened meanwhile are kept
+        self.dm_channels: tp.Dict[str, str] = {}
+        self.scheduler = ReminderScheduler()
+        self.answer_queue = AnswerQueue(self.database_manager, answer_log=self._open_answer_log())
+        self.user_sync = UserSync(self.dispatcher, self.database_manager)
         self.audit_session = None
-        self.admins = [user.id for user in self.database_manager.get_users('/admin_show')]
+        # Handlers may look up the session while the warm-up job resumes audits
+        self._session_lock = threading.Lock()
+        # Replicas split every reminder round into this many shards
+        self.shards = int(os.environ.get('BOT_SHARDS') or AuditSession.DEFAULT_SHARDS)
+        self.reminder_policy = ReminderPolicy.from_env()
+        # Loaded by the role listener when it starts, or by the first role check
+        self.roles = RoleCache(self.database_manager)
         # for future setup where audit name will be set from bot
         self.audit_name = "user_location"  # will be None
+        self.reports = ReportCache(os.path.join(AuditSession.DEFAULT_AUDITS_FOLDER, 'reports'))
 
         # Define bot commands and event handlers
         # Audit control
-        self.app.command("/audit_start")(self.admin_check(self.start_audit))
-        self.app.command("/audit_stop")(self.admin_check(self.close_audit))
-        self.app.command("/audit_unanswered")(self.admin_check(self.show_users))
+        self._command("/audit_start", self.admin_check(self.start_audit))
+        self._command("/audit_stop", self.admin_check(self.close_audit))
+        self._command("/audit_unanswered", self.admin_check(self.show_users))
 
         # User commands
-        self.app.command("/answer")(self.collect_answer)
-        self.app.command("/user_help")(self.show_user_help)
-        self.app.command("/admin_show")(self.show_users)
-        self.app.message()(self.shadow_answer)
+        self._command("/answer", self.collect_answer)
+        self._command("/user_help", self.show_user_help)
+        self._command("/admin_show", self.show_users)
+        self._message(self.shadow_answer)
+        self._action(UserListPage.NEXT_ACTION_ID, self.show_users_page)
 
         # Admin commands
-        self.app.command("/users_update")(self.admin_check(self.update_users))
-        self.app.command("/ignore_show")(self.admin_check(self.show_users))
-        self.app.command("/ignore_update")(self.admin_check(self.update_ignore))
+        self._command("/users_update", self.admin_check(self.update_users))
+        self._command("/ignore_show", self.admin_check(self.show_users))
+        self._command("/ignore_update", self.admin_check(self.update_ignore))
 
-        # Not implemented commands
-        self.app.command("/audits_show")(self.admin_check(self.not_implemented))
-        self.app.command("/audit_get")(self.admin_check(self.not_implemented))
+        # Audit history
+        self._command("/audits_show", self.admin_check(self.show_audits))
+        self._command("/audit_get", self.admin_check(self.get_audit))
 
         # Socket mode handler to connect the bot to Slack
-        self.handler = SocketModeHandler(self.app, self.SLACK_APP_TOKEN)
+        self.handler = self._create_handler()
+
+        self.metrics_server = MetricsServer.from_environment()
+        self.metrics_logger = MetricsLogger.from_environment()
+        self._register_gauges()
+        self.record_startup('init', init_started)
+
+    def record_startup(self, phase: str, started: float, finished: tp.Optional[float] = None) -> None:
+        """
+        Record duration of a startup phase.
+
+        :param phase: Phase name
+        :param started: time.perf_counter() at phase start
+        :param finished: time.perf_counter() at phase end, now by default
+        """
+        seconds = (finished or time.perf_counter()) - started
+        self.startup[phase] = seconds
+        STARTUP_SECONDS.observe(seconds, phase=phase)
+
+    def _create_app(self):
+        """ Bolt application receiving commands """
+        return App(token=self.SLACK_BOT_TOKEN, name=self.APP_NAME)
+
+    def _create_client(self):
+        """ Blocking Slack Web API client """
+        return self.app.client
+
+    def _create_dispatcher(self):
+        """ Dispatcher used for rate limited Slack calls and message fan-out """
+        return MessageDispatcher(self.client)
+
+    def _create_handler(self):
+        """ Socket mode handler connecting the app to Slack """
+        # Not imported by the asyncio runtime, which uses its own handler
+        from slack_bolt.adapter.socket_mode import SocketModeHandler
+        return SocketModeHandler(self.app, self.SLACK_APP_TOKEN)
+
+    def _command(self, name, handler):
+        """ Register slash command handler """
+        self.app.command(name)(timed_handler(name, handler))
+
+    def _action(self, action_id, handler):
+        """ Register handler of interactive components, e.g. buttons """
+        self.app.action(action_id)(timed_handler(action_id, handler))
+
+    def _message(self, handler):
+        """ Register handler of plain messages """
+        self.app.message()(timed_handler('message', handler))
 
     def __check_tokens(self):
         """ Check if slack token vars exist in the system """
@@ -57,13 +163,88 @@ class AuditBot:
         """ Decorator to check if the command is issued by an admin."""
         def wrapper(ack, body, say, *args, **kwargs):
             ack()
-            user_id = body["user_id"]
-            if user_id not in self.admins:
+            if not self.roles.is_admin(self._user_id(body)):
                 say("You are not authorized to perform this action.")
                 return
             return func(ack, body, say, *args, **kwargs)
         return wrapper
 
+    @staticmethod
+    def _user_id(body) -> str:
+        """ User who ran a command or clicked a button """
+        return body.get('user_id') or body['user']['id']
+
+    def _resume_audits(self):
+        """ Restore audits which were running before restart. Their first message is not sent again. """
+        with self._session_lock:
+            for schedule in self.database_manager.get_active_schedules(with_state=True):
+                if self.audit_session is not None and self.audit_session.audit_id == schedule.audit_id:
+                    # Already taken over by a command handled during warm-up
+                    continue
+                session = self._resume_session(schedule)
+                if schedule.audit_name == self.audit_name:
+                    self.audit_session = session
+
+    def _warm_up(self) -> None:
+        """ Scheduler job loading state which is not needed to accept events: DM channels and running audits """
+        started = time.perf_counter()
+        for user_id, channel_id in self.database_manager.get_dm_channels().items():
+            self.dm_channels.setdefault(user_id, channel_id)
+        self._resume_audits()
+        self.record_startup('warm_up', started)
+        log_json('startup', **self.startup)
+        return None
+
+    def _resume_session(self, schedule) -> AuditSession:
+        session = AuditSession.resume(
+            schedule, self.send_message, self.database_manager, self.scheduler,
+            dispatcher=self.dispatcher, answer_queue=self.answer_queue, shards=self.shards,
+            policy=self.reminder_policy
+        )
+        print(f"Audit '{session.label}' resumed, next reminder at {schedule.next_run_at}")
+        return session
+
+    def sync_sessions(self):
+        """ Follow audits opened, changed or closed by another bot replica """
+        with self._session_lock:
+            self._sync_session()
+
+    def _sync_session(self):
+        schedule = self._active_schedule(with_state=False)
+        session = self.audit_session
+        if session is not None and (schedule is None or schedule.audit_id != session.audit_id):
+            print(f"Audit '{session.label}' was closed by another replica")
+            session.detach()
+            self.audit_session = session = None
+        if schedule is None:
+            return
+        if session is None:
+            # Pending and notified users are only loaded when the session is taken over
+            schedule = self._active_schedule(with_state=True)
+            if schedule is not None:
+                self.audit_session = self._resume_session(schedule)
+        else:
+            session.sync(schedule)
+
+    def _active_schedule(self, with_state: bool):
+        for schedule in self.database_manager.get_active_schedules(with_state=with_state):
+            if schedule.audit_name == self.audit_name:
+                return schedule
+        return None
+
+    def _sync_sessions_job(self) -> float:
+        try:
+            self.sync_sessions()
+        except SQLAlchemyError as e:
+            print(f"Audit sessions sync failed: {e}")
+        return time.time() + self.SESSION_SYNC_INTERVAL
+
+    def _active_session(self) -> tp.Optional[AuditSession]:
+        """ Local audit session, looked up in the database if another replica may have opened it """
+        if self.audit_session is None:
+            self.sync_sessions()
+        return self.audit_session
+
     def not_implemented(self, ack, body, say):
         """ Plug for handling uncreated commands"""
         ack()
@@ -74,86 +255,248 @@ class AuditBot:
         audit_message = body.get("text")
         say(f"Users will receive next message: \n{audit_message}")
         ack()  # Acknowledge the command
-        if self.audit_session is not True:
-            self.audit_session = AuditSession(self.audit_name, self.send_message, self.database_manager)
-            self.audit_session.open_session(audit_message)
+        if self._active_session() is None:
+            self.audit_session = AuditSession(
+                self.audit_name, self.send_message, self.database_manager, self.scheduler,
+                dispatcher=self.dispatcher, answer_queue=self.answer_queue, shards=self.shards,
+                policy=self.reminder_policy
+            )
+            self.audit_session.open_session(audit_message, status_channel=body.get('channel_id'))
         else:
             say("There is already an active audit session.")
 
-    def send_message(self, user_id, message):
+    def send_message(self, user_id, message) -> bool:
         """ Alarm. Danger. This func can send messages to real people in your workspace. """
         if not self.debug:
             try:
-                response = self.app.client.conversations_open(users=user_id)
-                dm_channel_id = response["channel"]["id"]
-
-                self.app.client.chat_postMessage(
-                    channel=dm_channel_id,
-                    text=message
-                )
+                try:
+                    self._post_direct_message(user_id, message)
+                except SlackApiError as e:
+                    if e.response['error'] != 'channel_not_found' or user_id not in self.dm_channels:
+                        raise
+                    # Cached channel is gone, open a new one
+                    self._forget_dm_channel(user_id)
+                    self._post_direct_message(user_id, message)
             except SlackApiError as e:
+                if e.response['error'] in ReminderPolicy.DEACTIVATED_ERRORS:
+                    # The audit session stops messaging the user
+                    raise
                 print(f"Error sending message: {e.response['error']}")
+                return False
         else:
             print(f'Message sending initialized. Message not sent - Debug "{self.debug}"')
+        return True
 
+    def _post_direct_message(self, user_id, message):
+        """ Post message to the user's DM channel, opening it only if not cached """
+        dm_channel_id = self.dm_channels.get(user_id)
+        opened = dm_channel_id is None
+        if opened:
+            response = self.dispatcher.call('conversations_open', users=user_id)
+            dm_channel_id = response["channel"]["id"]
+            self.dm_channels[user_id] = dm_channel_id
+
+        self.dispatcher.call(
+            'chat_postMessage',
+            channel=dm_channel_id,
+            text=message
+        )
+        if opened:
+            # Stored after the message is sent, the database only saves a conversations.open call after restart
+            try:
+                self.database_manager.save_dm_channel(user_id, dm_channel_id)
+            except SQLAlchemyError as e:
+                print(f"DM channel of {user_id} is cached in memory only: {e}")
+
+    def _forget_dm_channel(self, user_id):
+        """ Drop cached DM channel of the user """
+        self.dm_channels.pop(user_id, None)
+        try:
+            self.database_manager.delete_dm_channel(user_id)
+        except SQLAlchemyError as e:
+            # The stored channel fails once after restart and is replaced then
+            print(f"DM channel of {user_id} was not deleted from the database: {e}")
+
+    def _open_answer_log(self) -> tp.Optional[AnswerLog]:
+        """ Local answer log of this replica, ANSWER_LOG_DIR=off keeps answers in memory only """
+        folder = os.environ.get('ANSWER_LOG_DIR') or os.path.join(AuditSession.DEFAULT_AUDITS_FOLDER, 'answer_log')
+        if folder.strip().lower() == 'off':
+            return None
+        try:
+            return AnswerLog(AnswerLog.default_folder(folder))
+        except OSError as e:
+            print(f"Answer log is disabled, answers are kept in memory until written: {e}")
+            return None
 
     def collect_answer(self, ack, body, say):
-        """Takes the user's answer and puts it into the database"""
+        """Takes the user's answer and puts it into the answer queue"""
         ack()
         data = {
             'id': body['user_id'],
             'name': body.get('user_name'),
             'answer': body['text']
         }
-        if not self.audit_session:
+        try:
+            session = self._active_session()
+        except SQLAlchemyError as e:
+            print(f"Audit session lookup failed: {e}")
+            say("The audit database is not available right now, please send your answer again in a few minutes.")
+            return
+        if not session:
             say("There is no active audit session. Please wait until an audit is started.")
         else:
-            # existed_answer = self.database_manager.check_if_answer_exist(data)
-            # if not existed_answer:
-            self.audit_session.add_response(data)
-            say(f"Thank you <@{body['user_id']}>! Your response '{body['text']}' has been recorded.")
-            #else:
-            #    say("You already answered.")
+            if session.add_response(data):
+                say(f"Thank you <@{body['user_id']}>! Your response was updated to '{body['text']}'.")
+            else:
+                say(f"Thank you <@{body['user_id']}>! Your response '{body['text']}' has been recorded.")
 
     def close_audit(self, ack, body, say):
-        """ Close audit and return audit report .xlsx file """
+        """ Close audit and return audit report file: xlsx by default, csv or parquet from command text """
         ack()  # Acknowledge the command
         channel_id = body.get('channel_id')
-        if self.audit_session is not None:
+        file_format = (body.get('text') or '').strip().lower() or 'xlsx'
+        if file_format not in ReportWriter.FORMATS:
+            say(f"Unknown report format '{file_format}', use one of: {', '.join(ReportWriter.FORMATS)}")
+        elif self._active_session() is not None:
             self.audit_session.close_session()
-            audit_summary = self.audit_session.get_audit_summary()
-            self.app.client.files_upload_v2(
+            audit_id, self.audit_session = self.audit_session.audit_id, None
+            self._send_report(say, channel_id, audit_id, file_format, "Audit closed!\nHere's report file :smile:")
+        else:
+            say("There is no active audit session to close.")
+
+    def _send_report(self, say, channel_id, audit_id, file_format, comment=None):
+        """ Send report of an audit, the file is reused until the audit changes. Failures are told to the user """
+        try:
+            audit = self.database_manager.get_audit(audit_id)
+            if audit is None:
+                say(f"Audit {audit_id} not found.")
+                return
+            if comment is None:
+                state = "open" if audit.closed_at is None else "closed"
+                comment = f"Report of {state} audit #{audit.id} {audit.name}"
+            path = self.reports.get(
+                audit.id, audit.updated_at, file_format,
+                lambda: self.database_manager.iter_report_rows(audit.id)
+            )
+            self.client.files_upload_v2(
                 channel=channel_id,
-                initial_comment="Audit closed!\nHere's report file :smile:",
-                file=audit_summary,
+                initial_comment=comment,
+                file=path,
+                filename=f"{audit.name}_{audit.audit_date.strftime('%d%m%Y')}.{file_format}",
             )
-            self.audit_session = None
+        except (SlackApiError, SQLAlchemyError, OSError) as e:
+            print(f"Report of audit {audit_id} was not sent: {e}")
+            say(f"Report of audit #{audit_id} was not sent, try again with /audit_get {audit_id}")
+
+    @staticmethod
+    def _format_audit(audit) -> str:
+        """ One line of the audit list: ID, name, day, answers and completion rate """
+        text = f"#{audit.id} {audit.name} {audit.audit_date.strftime('%d.%m.%Y')}: {audit.response_count}"
+        if audit.target_count:
+            text += f"/{audit.target_count} answered ({audit.response_count * 100 // audit.target_count}%)"
         else:
-            say("There is no active audit session to close.")
+            text += " answered"
+        return text + (" - open" if audit.closed_at is None else "")
+
+    @staticmethod
+    def _prefixed_id(token: str, prefix: str) -> tp.Optional[int]:
+        """ Audit ID of a token like id:12, None if the token has another prefix or no number after it """
+        if not token.lower().startswith(prefix):
+            return None
+        value = token[len(prefix):]
+        return int(value) if value.isdigit() else None
+
+    def show_audits(self, ack, body, say):
+        """ List audits, newest first. Text may contain an audit name and before:<id> to continue before """
+        ack()
+        name, before_id = None, None
+        for token in (body.get('text') or '').split():
+            if not token.lower().startswith(self.BEFORE_ID_PREFIX):
+                if name is not None:
+                    # Audit names have no spaces, a second word is a mistake
+                    say(self.AUDITS_SHOW_USAGE)
+                    return
+                name = token
+                continue
+            before_id = self._prefixed_id(token, self.BEFORE_ID_PREFIX)
+            if before_id is None:
+                say(self.AUDITS_SHOW_USAGE)
+                return
+        audits = self.database_manager.list_audits(self.AUDITS_PAGE_SIZE + 1, before_id, name)
+        if not audits:
+            say("No audits found.")
+            return
+        lines = [self._format_audit(audit) for audit in audits[:self.AUDITS_PAGE_SIZE]]
+        if len(audits) > self.AUDITS_PAGE_SIZE:
+            next_page = ' '.join(filter(None, (name, f"{self.BEFORE_ID_PREFIX}{audits[self.AUDITS_PAGE_SIZE - 1].id}")))
+            lines.append(f"Older audits: /audits_show {next_page}")
+        say("Audits:\n" + '\n'.join(lines))
+
+    def get_audit(self, ack, body, say):
+        """ Send report of any audit: /audit_get [id:]<id> [xlsx|csv|parquet] or the latest audit of a name """
+        ack()
+        tokens = (body.get('text') or '').split()
+        if not tokens or len(tokens) > 2:
+            say(self.AUDIT_GET_USAGE)
+            return
+        file_format = tokens[1].lower() if len(tokens) > 1 else 'xlsx'
+        if file_format not in ReportWriter.FORMATS:
+            say(f"Unknown report format '{file_format}', use one of: {', '.join(ReportWriter.FORMATS)}")
+            return
+        if tokens[0].isdigit():
+            audit_id = int(tokens[0])
+        elif tokens[0].lower().startswith(self.AUDIT_ID_PREFIX):
+            audit_id = self._prefixed_id(tokens[0], self.AUDIT_ID_PREFIX)
+            if audit_id is None:
+                say(self.AUDIT_GET_USAGE)
+                return
+        else:
+            latest = self.database_manager.list_audits(1, name=tokens[0])
+            if not latest:
+                say(f"No audits named '{tokens[0]}' found.")
+                return
+            audit_id = latest[0].id
+        if self.audit_session is not None and self.audit_session.audit_id == audit_id:
+            # Answers buffered by this replica belong to the report
+            self.answer_queue.flush()
+        self._send_report(say, body.get('channel_id'), audit_id, file_format)
 
     def update_users(self, ack, body, say):
         """ Gather user data from Slack. Update slack user status if_delete and add new users. """
-        users = self.app.client.users_list()['members']
-        self.database_manager.update_users(users)
-        say("Users updated")
+        if self.user_sync.is_running:
+            say("Users update is already running")
+            return
+
+        try:
+            summary = self.user_sync.run(
+                progress=lambda page, totals: print(f"Users update: page {page} stored, {totals}")
+            )
+        except (SlackApiError, SQLAlchemyError, RuntimeError) as e:
+            say(f"Users update interrupted, run the command again to resume: {e}")
+            return
+
+        if self.audit_session is not None:
+            self.audit_session.refresh_pending()
+        text = "Users updated" + (" (resumed)" if self.user_sync.resumed else "")
+        say(f"{text}: " + ', '.join(f'{key} {value}' for key, value in summary.items()))
 
     def _format_user_list(self, users: tp.Text) -> tp.List[tp.Dict]:
         """
-        Format list of users from string to dict
+        Format list of users from string to dict.
+        Mentions (<@U123> or <@U123|name>) keep the user ID, so the name is not looked up.
         :param users: Str
         :return: List of dicts
         """
-        users = users.split(' ')
-        formatted_users = [
-            {
-                'id': None,
-                'name': user.replace('@', ''),
+        formatted_users = []
+        for user in users.split():
+            mention = self._MENTION.fullmatch(user)
+            formatted_users.append({
+                'id': mention.group('id') if mention else None,
+                'name': mention.group('name') if mention else user.replace('@', ''),
                 'profile': {
                     'real_name': None
                 }
-            }
-            for user in users
-        ]
+            })
         return formatted_users
 
     def _handle_list_of_users(self, body: tp.Dict, update_type: str) -> tp.Text:
@@ -162,7 +505,7 @@ class AuditBot:
 
         :param users: List of usernames to update
         :param update_type: Type of update ('admin' or 'ignore')
-        :return: List of not found users
+        :return: Reply with not found users and names shared by several users
         :raises ValueError: If invalid update_type provided
         """
         if update_type not in ['admin', 'ignore']:
@@ -170,18 +513,24 @@ class AuditBot:
 
         text = f'{update_type.title()} list updated'
         users = self._format_user_list(body.get('text'))
-        not_found_users = self.database_manager.update_users(users,
-                                                             to_ignore=(update_type == 'ignore'),
-                                                             to_admin=(update_type == 'admin'),
-                                                             by_name=True)
+        not_found_users, ambiguous_names = self.database_manager.update_users(users,
+                                                                              to_ignore=(update_type == 'ignore'),
+                                                                              to_admin=(update_type == 'admin'),
+                                                                              by_name=True)
         if not_found_users:
-            text += f"\nCould not find the following users: {', '.join(user.get('name')for user in not_found_users)}"
+            not_found = ', '.join(user.get('name') or f"<@{user['id']}>" for user in not_found_users)
+            text += f"\nCould not find the following users: {not_found}"
+        if ambiguous_names:
+            text += (f"\nSeveral users have these names, they were not updated, mention them with @ instead: "
+                     f"{', '.join(ambiguous_names)}")
         return text
 
     def update_ignore(self, ack, body, say):
         """ Update list of users which audit can ignore """
         ack()
         result = self._handle_list_of_users(body, 'ignore')
+        if self.audit_session is not None:
+            self.audit_session.refresh_pending()
         say(result)
 
     def update_admin(self, ack, body, say):
@@ -191,28 +540,53 @@ class AuditBot:
         say(result)
 
     def show_users(self, ack, body, say):
-        """ Universal command to show a list of users. Depends on which command is triggered."""
+        """ Universal command to show a list of users page by page. Depends on which command is triggered."""
         ack()
-        command_mapping = {
-            "/ignore_show": "Ignored users:",
-            "/admin_show": "Admin users:",
-            "/audit_unanswered": "Audit unanswered:",
-        }
         command_name = body.get('command')
-        if not self.audit_session and command_name == "/audit_unanswered":
+        if command_name not in self.USER_LISTS:
+            say("Unknown setup.")
+        elif command_name == "/audit_unanswered" and not self._active_session():
             say("There is no active audit session")
         else:
+            audit_id = self.audit_session.audit_id if command_name == "/audit_unanswered" else None
+            say(**self._users_page(command_name, audit_id))
 
-            users_to_show = self.database_manager.get_users(
-                command_name,
-                None if not self.audit_session else self.audit_session.table_name
-            )
-            if isinstance(users_to_show, str):
-                say(users_to_show)
-            else:
-                users_to_show = '\n'.join(f'<@{user.id}>' for user in users_to_show)
-                text = f"{command_mapping.get(command_name, 'Users:')}\n{users_to_show}"
-                say(text)
+    def show_users_page(self, ack, body, say):
+        """ Next page of a user list, requested with the button under the previous page """
+        ack()
+        page = json.loads(body['actions'][0]['value'])
+        # Same access as the command which showed the first page
+        if page['command'] != "/admin_show" and not self.roles.is_admin(self._user_id(body)):
+            say("You are not authorized to perform this action.")
+            return
+        say(**self._users_page(page['command'], page.get('audit_id'), page['after'], page['number']))
+
+    def _users_page(self, command_name, audit_id=None, after_id=None, number=1) -> tp.Dict[str, tp.Any]:
+        """
+        Render one page of a user list. Unanswered users are read from the database by keyset on users.id,
+        admins and ignored users from the role cache.
+        """
+        limit = UserListPage.PAGE_SIZE + 1
+        if command_name == "/audit_unanswered":
+            user_ids = self.database_manager.get_unanswered_page(audit_id, limit, after_id)
+        else:
+            user_ids = self._role_page(command_name, limit, after_id)
+        return self._render_users_page(command_name, audit_id, user_ids, number)
+
+    def _role_page(self, command_name, limit, after_id=None) -> tp.List[str]:
+        """ User IDs of a page of admins or ignored users from the role cache """
+        roles = self.roles.admins if command_name == "/admin_show" else self.roles.ignored
+        return sorted(user_id for user_id in roles if after_id is None or user_id > after_id)[:limit]
+
+    def _render_users_page(self, command_name, audit_id, user_ids, number) -> tp.Dict[str, tp.Any]:
+        """ Message of a user list page, user_ids has one ID more than the page if there is a next page """
+        next_page = None
+        if len(user_ids) > UserListPage.PAGE_SIZE:
+            user_ids = user_ids[:UserListPage.PAGE_SIZE]
+            next_page = json.dumps({
+                'command': command_name, 'audit_id': audit_id, 'after': user_ids[-1], 'number': number + 1
+            })
+        return UserListPage.render(self.USER_LISTS[command_name], user_ids, number, next_page)
 
     def show_user_help(self, ack, body, say):
         """ Return to user string with help information """
@@ -227,6 +601,56 @@ class AuditBot:
             channel=body.get('event').get('channel'),
             thread_ts=body.get('event').get('ts'))
 
+    def _register_gauges(self):
+        """ Expose state of the background workers as gauges """
+        REGISTRY.gauge('bot_answer_queue_depth', 'Answers waiting to be written', lambda: self.answer_queue.depth)
+        REGISTRY.gauge('bot_answer_queue_max_flush_seconds', 'Slowest answer batch write',
+                       lambda: self.answer_queue.max_flush_latency)
+        if self.answer_queue.answer_log is not None:
+            REGISTRY.gauge('bot_answer_log_unreleased', 'Answers in the local answer log not written to the database',
+                           lambda: self.answer_queue.answer_log.unreleased)
+            REGISTRY.gauge('bot_answer_log_max_sync_seconds', 'Slowest answer log fsync',
+                           lambda: self.answer_queue.answer_log.max_sync_latency)
+        pool_gauges = {
+            'size': ('bot_db_pool_size', 'Database connections kept in the pool'),
+            'checked_out': ('bot_db_pool_checked_out', 'Database connections in use'),
+            'overflow': ('bot_db_pool_overflow', 'Database connections opened above the pool size'),
+            'checkouts': ('bot_db_pool_checkouts', 'Database connection checkouts'),
+            'timeouts': ('bot_db_pool_timeouts', 'Database connection checkouts which timed out'),
+            'wait_avg': ('bot_db_pool_wait_avg_seconds', 'Average wait for a database connection'),
+            'wait_max': ('bot_db_pool_wait_max_seconds', 'Longest wait for a database connection'),
+        }
+        for key, (name, documentation) in pool_gauges.items():
+            REGISTRY.gauge(name, documentation, lambda key=key: self.database_manager.pool_stats()[key])
+        REGISTRY.gauge('bot_pending_users', 'Users who have not answered the active audit',
+                       lambda: len(self.audit_session.pending_users) if self.audit_session else 0)
+
+    def _start_workers(self):
+        """ Start background workers: metrics, answer queue, role listener and reminder scheduler """
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        if self.metrics_logger is not None:
+            self.metrics_logger.start()
+        self.answer_queue.start()
+        self.roles.start()
+        # Buffered answers are written on exit, also when the container is stopped with SIGTERM
+        atexit.register(self.answer_queue.close)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.scheduler.schedule('session-sync', self._sync_sessions_job, time.time() + self.SESSION_SYNC_INTERVAL)
+        self.scheduler.start()
+
+    def _connected(self, connect_started: float) -> None:
+        """ Record how long it took to accept events and start loading state """
+        self.record_startup('connect', connect_started)
+        self.record_startup('ready', self.started_at)
+        log_json('startup', **self.startup)
+        # Queries of the warm-up do not compete with the socket connection
+        self.scheduler.schedule('warm-up', self._warm_up, time.time())
+
     def start(self):
         """ Connects to Slack in socket mode"""
-        self.handler.start()
\ No newline at end of file
+        self._start_workers()
+        connect_started = time.perf_counter()
+        self.handler.connect()
+        self._connected(connect_started)
+        threading.Event().wait()
\ No newline at end of file
@@ -0,0 +1,62 @@
+import typing as tp
+
+
+class UserListPage:
+    """
+    Render a page of user mentions as Block Kit blocks within Slack message limits.
+    """
+    # Users per page, a mention takes about 15 characters
+    PAGE_SIZE = 200
+    # Slack limits: characters of a section text and blocks of a message
+    SECTION_CHARS = 3000
+    MAX_BLOCKS = 50
+    NEXT_ACTION_ID = 'user_list_next_page'
+
+    @classmethod
+    def render(
+            cls,
+            title: str,
+            user_ids: tp.Sequence[str],
+            number: int = 1,
+            next_page: tp.Optional[str] = None
+    ) -> tp.Dict[str, tp.Any]:
+        """
+        Build message arguments of one page.
+
+        :param title: List title, e.g. "Admin users:"
+        :param user_ids: User IDs of the page
+        :param number: Page number, starting with 1
+        :param next_page: Value of the next page button, no button if None
+        :return: Keyword arguments for say: fallback text and blocks
+        """
+        first = (number - 1) * cls.PAGE_SIZE + 1
+        heading = f"*{title}* {first}-{first + len(user_ids) - 1}" if user_ids else f"*{title}* none"
+        blocks = [cls._section(heading)]
+        lines: tp.List[str] = []
+        size = 0
+        for user_id in user_ids:
+            line = f'<@{user_id}>'
+            if lines and size + len(line) + 1 > cls.SECTION_CHARS:
+                blocks.append(cls._section('\n'.join(lines)))
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line) + 1
+        if lines:
+            blocks.append(cls._section('\n'.join(lines)))
+        if next_page is not None:
+            blocks.append({
+                'type': 'actions',
+                'elements': [{
+                    'type': 'button',
+                    'text': {'type': 'plain_text', 'text': 'Next page'},
+                    'action_id': cls.NEXT_ACTION_ID,
+                    'value': next_page,
+                }],
+            })
+        if len(blocks) > cls.MAX_BLOCKS:
+            raise ValueError(f"Page of {len(user_ids)} users needs {len(blocks)} blocks, lower PAGE_SIZE")
+        return {'text': f"{title} {len(user_ids)} users", 'blocks': blocks}
+
+    @staticmethod
+    def _section(text: str) -> tp.Dict[str, tp.Any]:
+        return {'type': 'section', 'text': {'type': 'mrkdwn', 'text': text}}
@@ -0,0 +1,103 @@
+import time
+import threading
+import typing as tp
+
+from slack_sdk.errors import SlackApiError
+
+from db import DataBaseManager
+from dispatcher import MessageDispatcher
+
+
+class UserSync:
+    """
+    Stream Slack workspace members page by page into the users table.
+    """
+    DEFAULT_PAGE_SIZE = 200
+    # Seconds an interrupted sync can be resumed from its cursor, later it starts from the first page
+    CURSOR_MAX_AGE = 3600
+
+    def __init__(
+            self,
+            dispatcher: MessageDispatcher,
+            database_manager: DataBaseManager,
+            page_size: int = DEFAULT_PAGE_SIZE
+    ):
+        """
+        Initialize user sync.
+
+        :param dispatcher: Dispatcher used for rate limited Slack calls
+        :param database_manager: Database manager
+        :param page_size: Members requested per users.list call
+        """
+        self._dispatcher = dispatcher
+        self._database_manager = database_manager
+        self._lock = threading.Lock()
+        self.page_size = page_size
+        # Cursor of the first page not stored yet, set when a sync was interrupted, and when it was stored
+        self.cursor: tp.Optional[str] = None
+        self.cursor_stored_at = 0.0
+        # Whether the last run continued an interrupted one
+        self.resumed = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def iter_pages(self, cursor: tp.Optional[str] = None) -> tp.Iterator[tp.Tuple[tp.List[tp.Dict], tp.Optional[str]]]:
+        """
+        Walk users.list cursors.
+
+        :param cursor: Cursor to start from, None for the first page
+        :return: Iterator of (members, next cursor) pairs, next cursor is None on the last page
+        """
+        while True:
+            kwargs = {'limit': self.page_size}
+            if cursor:
+                kwargs['cursor'] = cursor
+            response = self._dispatcher.call('users_list', **kwargs)
+            cursor = (response.get('response_metadata') or {}).get('next_cursor') or None
+            yield response['members'], cursor
+            if cursor is None:
+                return
+
+    def run(self, progress: tp.Optional[tp.Callable[[int, tp.Dict[str, int]], None]] = None) -> tp.Dict[str, int]:
+        """
+        Sync all members, resuming from the stored cursor if the previous run was interrupted
+        less than CURSOR_MAX_AGE seconds ago. An expired cursor restarts the sync from the first page.
+
+        :param progress: Called after every stored page with page number and running totals
+        :return: Number of added, reactivated, deactivated and unchanged users
+        :raises RuntimeError: If a sync is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("User sync is already running")
+
+        try:
+            if self.cursor is not None and time.time() - self.cursor_stored_at > self.CURSOR_MAX_AGE:
+                print("Users update: the interrupted sync is too old to resume, starting from the first page")
+                self.cursor = None
+            self.resumed = self.cursor is not None
+            try:
+                return self._sync_pages(progress)
+            except SlackApiError as e:
+                if e.response.get('error') != 'invalid_cursor' or self.cursor is None:
+                    raise
+                # Cursors expire, the sync is started again instead of failing on every run
+                print("Users update: Slack rejected the stored cursor, starting from the first page")
+                self.cursor = None
+                self.resumed = False
+                return self._sync_pages(progress)
+        finally:
+            self._lock.release()
+
+    def _sync_pages(self, progress: tp.Optional[tp.Callable[[int, tp.Dict[str, int]], None]]) -> tp.Dict[str, int]:
+        """Store pages from the stored cursor on, the cursor follows every stored page."""
+        summary = {'added': 0, 'reactivated': 0, 'deactivated': 0, 'unchanged': 0}
+        for page, (members, next_cursor) in enumerate(self.iter_pages(self.cursor), start=1):
+            for key, value in self._database_manager.sync_users(members).items():
+                summary[key] += value
+            self.cursor = next_cursor
+            self.cursor_stored_at = time.time()
+            if progress is not None:
+                progress(page, summary)
+        return summary
@@ -5,5 +5,80 @@ CREATE TABLE IF NOT EXISTS users (
     real_name VARCHAR NOT NULL,
     is_deleted BOOLEAN,
     is_admin BOOLEAN DEFAULT FALSE,
-    is_ignore BOOLEAN DEFAULT FALSE
+    is_ignore BOOLEAN DEFAULT FALSE,
+    -- Offset of the user's Slack timezone from UTC, seconds, for reminder quiet hours
+    tz_offset INTEGER
+);
+
+-- Usernames given to /ignore_update are resolved in one lookup
+CREATE INDEX IF NOT EXISTS users_name_idx ON users (name);
+
+-- Direct message channels opened by the bot, so reminders skip conversations.open
+CREATE TABLE IF NOT EXISTS dm_channels (
+    user_id VARCHAR PRIMARY KEY NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    channel_id VARCHAR NOT NULL
+);
+
+-- Catalogue of audits, one row per audit name and day
+CREATE TABLE IF NOT EXISTS audits (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    audit_date DATE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    closed_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    response_count INTEGER,
+    target_count INTEGER,
+    UNIQUE (name, audit_date)
+);
+
+-- Audits of one name are listed newest first
+CREATE INDEX IF NOT EXISTS audits_name_id_idx ON audits (name, id);
+
+-- Answers of all audits. Partitions of 100 audits each are created by the bot
+CREATE TABLE IF NOT EXISTS audit_responses (
+    audit_id INTEGER NOT NULL REFERENCES audits (id),
+    user_id VARCHAR NOT NULL,
+    name VARCHAR NOT NULL,
+    answer VARCHAR NOT NULL,
+    answered_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (audit_id, user_id)
+) PARTITION BY RANGE (audit_id);
+
+-- Every answer given in an audit, also the ones replaced by a later answer of the same user
+CREATE TABLE IF NOT EXISTS audit_answer_history (
+    audit_id INTEGER NOT NULL REFERENCES audits (id),
+    user_id VARCHAR NOT NULL,
+    answered_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    answer VARCHAR NOT NULL,
+    PRIMARY KEY (audit_id, user_id, answered_at)
+);
+
+-- Reminder schedule of audits, so reminders are resumed after restart
+CREATE TABLE IF NOT EXISTS audit_schedule (
+    audit_id INTEGER PRIMARY KEY NOT NULL REFERENCES audits (id),
+    message TEXT NOT NULL,
+    reminder_seconds INTEGER NOT NULL,
+    next_run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    initial_sent BOOLEAN NOT NULL DEFAULT FALSE,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    last_round_at TIMESTAMP WITH TIME ZONE,
+    status_channel VARCHAR,
+    status_ts VARCHAR
+);
+
+-- Messages sent to each user of an open audit: the last one and their number, for reminder backoff
+CREATE TABLE IF NOT EXISTS audit_notifications (
+    audit_id INTEGER NOT NULL REFERENCES audits (id),
+    user_id VARCHAR NOT NULL,
+    notified_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (audit_id, user_id)
+);
+
+-- Schema versions prepared by the bot, tables are not checked again on restart
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY NOT NULL,
+    prepared_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
 );
@@ -0,0 +1,120 @@
+import os
+import datetime
+
+import pytest
+
+from answer_log import AnswerLog
+from ingest import AnswerQueue
+
+
+def row(user_id: str, answer: str) -> dict:
+    return {'audit_id': 1, 'user_id': user_id, 'name': user_id.lower(), 'answer': answer,
+            'answered_at': datetime.datetime.now(datetime.timezone.utc)}
+
+
+def segments(folder) -> list:
+    return sorted(name for name in os.listdir(folder) if name.endswith(AnswerLog.SEGMENT_SUFFIX))
+
+
+def test_recover_keeps_every_answer_in_order(tmp_path):
+    answer_log = AnswerLog(str(tmp_path), segment_bytes=200)
+    for user_id, answer in (('U0', 'Paris'), ('U1', 'Oslo'), ('U0', 'Rome')):
+        answer_log.append(row(user_id, answer))
+    answer_log.close()
+    assert len(segments(tmp_path)) > 1
+    # A crash while writing leaves a cut last line, it was never acknowledged
+    with open(os.path.join(tmp_path, segments(tmp_path)[-1]), 'ab') as file:
+        file.write(b'{"audit_id": 1, "user_')
+
+    answer_log = AnswerLog(str(tmp_path))
+    recovered = answer_log.recover()
+    assert [(entry['user_id'], entry['answer']) for _, entry in recovered] == [
+        ('U0', 'Paris'), ('U1', 'Oslo'), ('U0', 'Rome')
+    ]
+    assert isinstance(recovered[0][1]['answered_at'], datetime.datetime)
+    assert len(segments(tmp_path)) == 1
+    assert answer_log.unreleased == 3
+
+    # New entries continue after the recovered ones
+    seq = answer_log.append(row('U2', 'Rome'))
+    assert seq > max(seq for seq, _ in recovered)
+    answer_log.close()
+
+
+def test_released_segments_are_deleted(tmp_path):
+    answer_log = AnswerLog(str(tmp_path), segment_bytes=200)
+    seqs = [answer_log.append(row(f'U{i}', 'Paris')) for i in range(6)]
+    assert len(segments(tmp_path)) > 2
+
+    answer_log.release(seqs[:-1])
+    # The segment written to is kept
+    assert len(segments(tmp_path)) == 1
+    assert answer_log.unreleased == 1
+
+    answer_log.release(seqs[-1:])
+    assert segments(tmp_path) == []
+    answer_log.append(row('U0', 'Rome'))
+    assert len(segments(tmp_path)) == 1
+    answer_log.close()
+
+
+def test_folder_is_used_by_one_process_only(tmp_path):
+    answer_log = AnswerLog(str(tmp_path))
+    with pytest.raises(OSError):
+        AnswerLog(str(tmp_path))
+    answer_log.close()
+
+
+def test_queue_replays_recovered_answers(tmp_path):
+    class Database:
+        batches = []
+
+        def add_responses(self, rows, history=None):
+            self.batches.append((rows, history))
+            return set()
+
+    answer_log = AnswerLog(str(tmp_path))
+    for answer in ('Paris', 'Rome'):
+        answer_log.append(row('U0', answer))
+    answer_log.close()
+
+    database = Database()
+    queue = AnswerQueue(database, answer_log=AnswerLog(str(tmp_path)))
+    queue.start()
+    queue.close()
+
+    (rows, history), = database.batches
+    assert [entry['answer'] for entry in rows] == ['Rome']
+    assert [entry['answer'] for entry in history] == ['Paris', 'Rome']
+    assert AnswerLog(str(tmp_path)).recover() == []
+
+
+class PartialWriteFile:
+    """Segment file which writes the first bytes of the next write and then fails, like a full disk."""
+    def __init__(self, file):
+        self._file = file
+        self.failed = False
+
+    def write(self, data: bytes) -> int:
+        if self.failed:
+            return self._file.write(data)
+        self.failed = True
+        self._file.write(data[:10])
+        self._file.flush()
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def test_answer_after_failed_write_survives_recover(tmp_path):
+    answer_log = AnswerLog(str(tmp_path))
+    answer_log.append(row('U0', 'Paris'))
+    answer_log._file = PartialWriteFile(answer_log._file)
+    with pytest.raises(OSError):
+        answer_log.append(row('U1', 'Oslo'))
+    answer_log.append(row('U2', 'Rome'))
+    answer_log.close()
+
+    recovered = AnswerLog(str(tmp_path)).recover()
+    assert [(entry['user_id'], entry['answer']) for _, entry in recovered] == [('U0', 'Paris'), ('U2', 'Rome')]
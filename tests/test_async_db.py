@@ -0,0 +1,37 @@
+import asyncio
+import datetime
+
+from async_db import AsyncDataBaseManager
+from conftest import TEST_SCHEMA
+from db import DataBaseManager
+
+USERS = [{'id': f'U{i}', 'name': f'user{i}'} for i in range(5)]
+
+
+def test_async_queries_match_sync_ones(database_manager: DataBaseManager):
+    database_manager.sync_users(USERS)
+    audit_id = database_manager.create_audit('location', datetime.date(2024, 1, 1))
+    database_manager.add_responses([{'audit_id': audit_id, 'user_id': 'U1', 'name': 'user1', 'answer': 'Paris',
+                                     'answered_at': datetime.datetime.now(datetime.timezone.utc)}])
+    database_manager.save_schedule({'audit_id': audit_id, 'message': 'Where are you?', 'reminder_seconds': 60,
+                                    'next_run_at': datetime.datetime.now(datetime.timezone.utc)})
+
+    async def run():
+        async_database_manager = AsyncDataBaseManager(
+            database_manager.engine.url.set(drivername='postgresql+asyncpg'),
+            {'connect_args': {'server_settings': {'search_path': TEST_SCHEMA}}}
+        )
+        try:
+            pages = [await async_database_manager.get_unanswered_page(audit_id, 2),
+                     await async_database_manager.get_unanswered_page(audit_id, 2, 'U2')]
+            active = [await async_database_manager.has_active_audit('location'),
+                      await async_database_manager.has_active_audit('other')]
+        finally:
+            await async_database_manager.engine.dispose()
+        return pages, active
+
+    pages, active = asyncio.run(run())
+    assert pages == [database_manager.get_unanswered_page(audit_id, 2),
+                     database_manager.get_unanswered_page(audit_id, 2, 'U2')]
+    assert pages == [['U0', 'U2'], ['U3', 'U4']]
+    assert active == [True, False]
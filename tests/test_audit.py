@@ -0,0 +1,66 @@
+import time
+import datetime
+
+import pytest
+
+from audit import AuditSession
+from db import DataBaseManager
+from reminders import ReminderPolicy
+from scheduler import ReminderScheduler
+
+USERS = [{'id': f'U{i}', 'name': f'user{i}', 'tz_offset': 3600 * i} for i in range(4)]
+
+
+@pytest.fixture(autouse=True)
+def audit_folder(tmp_path, monkeypatch):
+    # Sessions create their report folder in the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def test_resume_queues_reminders_from_stored_state(database_manager: DataBaseManager):
+    database_manager.sync_users(USERS)
+    audit_id = database_manager.create_audit('location', datetime.date(2024, 1, 1))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    database_manager.save_schedule({'audit_id': audit_id, 'message': 'Where are you?', 'reminder_seconds': 60,
+                                    'next_run_at': now, 'initial_sent': True})
+    database_manager.add_responses([{'audit_id': audit_id, 'user_id': 'U0', 'name': 'user0', 'answer': 'Paris',
+                                     'answered_at': now}])
+    # U3 got all its messages
+    database_manager.save_notifications(audit_id, [('U1', now, 1), ('U3', now, 3)])
+    schedule, = database_manager.get_active_schedules(with_state=True)
+
+    sent = []
+    scheduler = ReminderScheduler()
+    session = AuditSession.resume(
+        schedule, lambda user_id, text: sent.append((user_id, text)) or True, database_manager, scheduler,
+        policy=ReminderPolicy(max_messages=3, quiet_hours=None)
+    )
+    scheduler.cancel(session.label)
+
+    assert session.progress == (1, 3)
+    assert session._tz_offsets == {'U1': 3600, 'U2': 7200, 'U3': 10800}
+    assert len(session._queue) == 2
+    assert session._queue.next_due() == pytest.approx(time.time(), abs=5)
+    assert session._queue.pop_due(now.timestamp() + 59) == ['U2']
+    assert session._queue.pop_due(now.timestamp() + 60) == ['U1']
+
+
+def test_first_round_after_resume_does_not_refresh(database_manager: DataBaseManager, monkeypatch):
+    database_manager.sync_users(USERS)
+    audit_id = database_manager.create_audit('location', datetime.date(2024, 1, 1))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    database_manager.save_schedule({'audit_id': audit_id, 'message': 'Where are you?', 'reminder_seconds': 60,
+                                    'next_run_at': now, 'initial_sent': True})
+    schedule, = database_manager.get_active_schedules(with_state=True)
+
+    sent = []
+    scheduler = ReminderScheduler()
+    session = AuditSession.resume(
+        schedule, lambda user_id, text: sent.append((user_id, text)) or True, database_manager, scheduler,
+        policy=ReminderPolicy(quiet_hours=None)
+    )
+    scheduler.cancel(session.label)
+    monkeypatch.setattr(session, 'refresh_pending', pytest.fail)
+
+    session.run_round()
+    assert sorted(user_id for user_id, _ in sent) == ['U0', 'U1', 'U2', 'U3']
@@ -0,0 +1,98 @@
+import datetime
+
+from sqlalchemy import select
+
+from db import DataBaseManager
+from metrics import DB_TABLE_CACHE
+
+USERS = [{'id': f'U{i}', 'name': f'user{i}'} for i in range(3)]
+
+
+def answer(audit_id: int, user_id: str, text: str = 'Paris') -> dict:
+    return {'audit_id': audit_id, 'user_id': user_id, 'name': user_id.lower(), 'answer': text,
+            'answered_at': datetime.datetime.now(datetime.timezone.utc)}
+
+
+def test_audit_counts_are_per_audit(database_manager: DataBaseManager):
+    database_manager.sync_users(USERS)
+    first = database_manager.create_audit('location', datetime.date(2024, 1, 1))
+    second = database_manager.create_audit('location', datetime.date(2024, 1, 2))
+    # U0 answered the first audit only, it is still a target of the second one
+    database_manager.add_responses([answer(first, 'U0')])
+
+    counts = {row.id: (row.response_count, row.target_count) for row in database_manager.list_audits(10)}
+    assert counts == {first: (1, 3), second: (0, 3)}
+
+    database_manager.close_audit(second)
+    audit = database_manager.get_audit(second)
+    assert (audit.response_count, audit.target_count) == (0, 3)
+
+
+def test_resume_state_is_per_audit(database_manager: DataBaseManager):
+    database_manager.sync_users(USERS)
+    first = database_manager.create_audit('location', datetime.date(2024, 1, 1))
+    second = database_manager.create_audit('location', datetime.date(2024, 1, 2))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for audit_id in (first, second):
+        database_manager.save_schedule({'audit_id': audit_id, 'message': 'Where are you?', 'reminder_seconds': 60,
+                                        'next_run_at': now, 'initial_sent': True})
+    database_manager.add_responses([answer(first, 'U0')])
+    database_manager.save_notifications(second, [('U2', now, 2), ('U1', now, 1)])
+
+    schedules = {row.audit_id: row for row in database_manager.get_active_schedules(with_state=True)}
+    assert sorted(schedules[first].pending_users) == ['U1', 'U2']
+    assert schedules[first].answered_users == ['U0']
+    # U0 answered the first audit only
+    assert sorted(schedules[second].pending_users) == ['U0', 'U1', 'U2']
+    assert schedules[second].answered_users is None
+    assert schedules[second].notified_users == ['U1', 'U2']
+    assert schedules[second].notified_messages == [1, 2]
+
+
+def test_repeated_answer_replaces_and_keeps_history(database_manager: DataBaseManager):
+    database_manager.sync_users(USERS)
+    audit_id = database_manager.create_audit('location', datetime.date(2024, 1, 1))
+    first, second, third = (answer(audit_id, 'U0', text) for text in ('Paris', 'Rome', 'Oslo'))
+
+    assert database_manager.add_responses([first, answer(audit_id, 'U1')]) == set()
+    assert database_manager.add_responses([third], [second, third]) == {(audit_id, 'U0')}
+    # Replayed from the answer log after the newer answer was stored
+    assert database_manager.add_responses([first]) == set()
+
+    responses = database_manager.AuditResponse.__table__
+    history = database_manager.AuditAnswerHistory.__table__
+    with database_manager.engine.connect() as conn:
+        current = dict(conn.execute(select(responses.c.user_id, responses.c.answer)).all())
+        revisions = conn.execute(
+            select(history.c.answer).where(history.c.user_id == 'U0').order_by(history.c.answered_at)
+        ).scalars().all()
+    assert current == {'U0': 'Oslo', 'U1': 'Paris'}
+    assert revisions == ['Paris', 'Rome', 'Oslo']
+    assert database_manager.get_answered_users(audit_id) == {'U0', 'U1'}
+    assert database_manager.get_answered_users(audit_id, ['U1', 'U2']) == {'U1'}
+
+
+def test_table_cache_counts_hits_and_misses(database_manager: DataBaseManager):
+    def lookups(result: str) -> float:
+        return DB_TABLE_CACHE.snapshot().get(f'{{result="{result}"}}', 0)
+
+    hits, misses = lookups('hit'), lookups('miss')
+    assert database_manager.check_table_exists('users') is not None
+    assert database_manager.check_table_exists('users') is not None
+    assert database_manager.check_table_exists('user_location_01012020') is None
+
+    assert (database_manager.cache_hits, database_manager.cache_misses) == (1, 2)
+    assert (lookups('hit') - hits, lookups('miss') - misses) == (1, 2)
+
+
+def test_names_of_several_users_are_not_updated(database_manager: DataBaseManager):
+    database_manager.sync_users(USERS + [{'id': 'U9', 'name': 'user1'}])
+    not_found, ambiguous = database_manager.update_users(
+        [{'name': 'user0'}, {'name': 'user1'}, {'name': 'nobody'}, {'id': 'U9'}], to_admin=True, by_name=True
+    )
+    assert (not_found, ambiguous) == ([{'name': 'nobody'}], ['user1'])
+
+    users = database_manager.User.__table__
+    with database_manager.engine.connect() as conn:
+        admins = conn.execute(select(users.c.id).where(users.c.is_admin.is_(True)).order_by(users.c.id)).scalars()
+        assert admins.all() == ['U0', 'U9']
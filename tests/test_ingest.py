@@ -0,0 +1,48 @@
+import typing as tp
+
+import pytest
+
+from ingest import AnswerQueue
+
+
+class RecordingDatabase:
+    """Keeps written batches, fails while failing is set."""
+    def __init__(self):
+        self.batches: tp.List[tp.Tuple[tp.List[tp.Dict], tp.List[tp.Dict]]] = []
+        self.failing = False
+
+    def add_responses(self, rows: tp.List[tp.Dict], history: tp.Optional[tp.List[tp.Dict]] = None) -> tp.Set:
+        if self.failing:
+            raise RuntimeError("database is down")
+        self.batches.append((rows, history))
+        return set()
+
+
+def test_latest_answer_is_written_with_every_revision():
+    database = RecordingDatabase()
+    queue = AnswerQueue(database)
+    for text in ('Paris', 'Rome'):
+        queue.put(1, {'id': 'U0', 'name': 'user0', 'answer': text})
+    queue.put(1, {'id': 'U1', 'name': 'user1', 'answer': 'Oslo'})
+    queue.flush()
+
+    (rows, history), = database.batches
+    assert [(row['user_id'], row['answer']) for row in rows] == [('U0', 'Rome'), ('U1', 'Oslo')]
+    assert [(row['user_id'], row['answer']) for row in history] == [('U0', 'Paris'), ('U0', 'Rome'), ('U1', 'Oslo')]
+
+
+def test_failed_write_keeps_answers_and_newer_ones_win():
+    database = RecordingDatabase()
+    queue = AnswerQueue(database)
+    queue.put(1, {'id': 'U0', 'name': 'user0', 'answer': 'Paris'})
+    database.failing = True
+    with pytest.raises(RuntimeError):
+        queue.flush()
+    assert queue.depth == 1
+
+    queue.put(1, {'id': 'U0', 'name': 'user0', 'answer': 'Rome'})
+    database.failing = False
+    queue.flush()
+    (rows, history), = database.batches
+    assert [row['answer'] for row in rows] == ['Rome']
+    assert [row['answer'] for row in history] == ['Paris', 'Rome']
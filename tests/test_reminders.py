@@ -0,0 +1,52 @@
+import pytest
+
+from custom_exceptions import EnvironmentVarException
+from reminders import ReminderPolicy, ReminderQueue
+
+# 2024-01-01 00:00 UTC
+MIDNIGHT = 1704067200.0
+
+
+def test_next_due_backs_off_and_stops_at_the_cap():
+    policy = ReminderPolicy(backoff=2.0, max_messages=4, quiet_hours=None)
+    assert policy.next_due(0, 0.0, 60, now=MIDNIGHT) == MIDNIGHT
+    assert [policy.next_due(messages, MIDNIGHT, 60) - MIDNIGHT for messages in (1, 2, 3)] == [60, 120, 240]
+    assert policy.next_due(4, MIDNIGHT, 60) is None
+
+
+def test_quiet_hours_follow_the_user_timezone():
+    policy = ReminderPolicy(quiet_hours=(22, 8))
+    # 23:00 UTC is quiet in UTC, 01:00 in UTC+2, 18:00 in UTC-5
+    due = MIDNIGHT - 3600
+    assert policy.after_quiet_hours(due, 0) == MIDNIGHT + 8 * 3600
+    assert policy.after_quiet_hours(due, 7200) == MIDNIGHT + 6 * 3600
+    assert policy.after_quiet_hours(due, -5 * 3600) == due
+    # Unknown timezones are messaged at any time
+    assert policy.after_quiet_hours(due, None) == due
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv('REMINDER_BACKOFF', '1.5')
+    monkeypatch.setenv('REMINDER_MAX_MESSAGES', '3')
+    monkeypatch.setenv('REMINDER_QUIET_HOURS', 'off')
+    policy = ReminderPolicy.from_env()
+    assert (policy.backoff, policy.max_messages, policy.quiet_hours) == (1.5, 3, None)
+
+    monkeypatch.setenv('REMINDER_QUIET_HOURS', 'late')
+    with pytest.raises(EnvironmentVarException):
+        ReminderPolicy.from_env()
+
+
+def test_queue_moves_and_discards_users():
+    queue = ReminderQueue()
+    queue.push('U0', 30)
+    queue.push('U1', 10)
+    queue.push('U2', 20)
+    queue.push('U0', 5)
+    queue.discard('U2')
+
+    assert len(queue) == 2 and 'U2' not in queue
+    assert queue.next_due() == 5
+    assert queue.pop_due(10) == ['U0', 'U1']
+    assert queue.pop_due(100) == []
+    assert queue.next_due() is None
@@ -0,0 +1,69 @@
+import typing as tp
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from user_sync import UserSync
+
+
+class PagedDispatcher:
+    """Serves users.list pages of one member each, cursors are page numbers."""
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.failures: tp.Dict[str, str] = {}
+        self.cursors: tp.List[tp.Optional[str]] = []
+
+    def call(self, method: str, **kwargs) -> tp.Dict:
+        cursor = kwargs.get('cursor')
+        self.cursors.append(cursor)
+        if cursor in self.failures:
+            error = self.failures.pop(cursor)
+            raise SlackApiError(error, {'ok': False, 'error': error})
+        page = int(cursor or 0)
+        next_cursor = str(page + 1) if page + 1 < self.pages else ''
+        return {'members': [{'id': f'U{page}'}], 'response_metadata': {'next_cursor': next_cursor}}
+
+
+class CountingDatabase:
+    def __init__(self):
+        self.synced: tp.List[str] = []
+
+    def sync_users(self, members: tp.List[tp.Dict]) -> tp.Dict[str, int]:
+        self.synced.extend(member['id'] for member in members)
+        return {'added': len(members)}
+
+
+def test_interrupted_sync_resumes_from_cursor():
+    dispatcher, database = PagedDispatcher(3), CountingDatabase()
+    dispatcher.failures['2'] = 'ratelimited'
+    user_sync = UserSync(dispatcher, database)
+    with pytest.raises(SlackApiError):
+        user_sync.run()
+    assert user_sync.cursor == '2'
+
+    assert user_sync.run()['added'] == 1
+    assert user_sync.resumed
+    assert database.synced == ['U0', 'U1', 'U2']
+    assert user_sync.cursor is None
+
+
+def test_invalid_cursor_restarts_from_first_page():
+    dispatcher, database = PagedDispatcher(3), CountingDatabase()
+    user_sync = UserSync(dispatcher, database)
+    user_sync.cursor, user_sync.cursor_stored_at = '2', 1e12
+    dispatcher.failures['2'] = 'invalid_cursor'
+
+    assert user_sync.run()['added'] == 3
+    assert not user_sync.resumed
+    assert dispatcher.cursors == ['2', None, '1', '2']
+    assert user_sync.cursor is None
+
+
+def test_old_cursor_is_not_resumed():
+    dispatcher, database = PagedDispatcher(2), CountingDatabase()
+    user_sync = UserSync(dispatcher, database)
+    user_sync.cursor, user_sync.cursor_stored_at = '1', 0.0
+
+    assert user_sync.run()['added'] == 2
+    assert not user_sync.resumed
+    assert dispatcher.cursors == [None, '1']